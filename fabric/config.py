@@ -9,6 +9,109 @@ from .runners import Remote
 from .util import get_local_user, debug
 
 
+# Lookup results shared between CachedSSHConfig objects, keyed by hostname and
+# the identities of the rules they were computed from; see
+# CachedSSHConfig.lookup.
+_shared_lookups = {}
+_shared_lookups_max = 1024
+
+
+class CachedSSHConfig(SSHConfig):
+    """
+    An `~paramiko.config.SSHConfig` subclass which memoizes `lookup` results.
+
+    Each lookup walks every ``Host``/``Match`` rule loaded so far (and may even
+    incur DNS queries, if hostname canonicalization is enabled), which adds up
+    quickly when many `.Connection` objects are created from a single
+    `.Config`. Results are thus cached per hostname; the cache is discarded
+    whenever additional data is loaded via `parse`.
+
+    Results are also shared, process-wide, between instances holding the very
+    same rule objects - as is the case for every `.Config` which loaded the
+    same (unchanged) files, and their clones - so e.g. many `.Connection`
+    objects each given their own `.Config` only look up each host once.
+
+    Callers receive a copy of the cached result, so modifying it does not
+    affect subsequent lookups.
+
+    Nothing is cached while any ``Match exec`` rules are loaded, as their
+    outcome depends on running a command at lookup time.
+
+    .. versionadded:: 2.6
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CachedSSHConfig, self).__init__(*args, **kwargs)
+        self._lookups = {}
+
+    def parse(self, file_obj):
+        # New rules may change the outcome of any previous lookup.
+        self._lookups.clear()
+        return super(CachedSSHConfig, self).parse(file_obj)
+
+    def lookup(self, hostname):
+        if self._has_match_exec():
+            return super(CachedSSHConfig, self).lookup(hostname)
+        try:
+            options = self._lookups[hostname]
+        except KeyError:
+            options = self._shared_lookup(hostname)
+            self._lookups[hostname] = options
+        return copy.deepcopy(options)
+
+    def _has_match_exec(self):
+        # NOTE: 'matches' only exists on Paramiko versions supporting Match.
+        return any(
+            match["type"] == "exec"
+            for rule in self._config
+            for match in rule.get("matches", ())
+        )
+
+    def _shared_lookup(self, hostname):
+        # NOTE: each entry holds on to the rules its key refers to, so those
+        # ids can't be reused by other objects while the entry exists.
+        key = (hostname, tuple(id(x) for x in self._config))
+        try:
+            return _shared_lookups[key][1]
+        except KeyError:
+            pass
+        options = super(CachedSSHConfig, self).lookup(hostname)
+        if len(_shared_lookups) >= _shared_lookups_max:
+            _shared_lookups.clear()
+        _shared_lookups[key] = (list(self._config), options)
+        return options
+
+
+# Parsed SSH config file rules, keyed by path; see _parse_ssh_file.
+_ssh_file_cache = {}
+
+
+def _parse_ssh_file(path):
+    """
+    Return the list of rules parsed from the SSH config file at ``path``.
+
+    Results are cached process-wide, keyed by path and invalidated when the
+    file's modification time or size changes, so that many `.Config` objects
+    (e.g. one per `.Connection`) don't each re-read and re-parse the same
+    files.
+
+    .. note::
+        The returned rules are shared between callers and must be treated as
+        read-only (as `~paramiko.config.SSHConfig` itself does once parsing
+        is complete.)
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_mtime, stat.st_size)
+    cached = _ssh_file_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    parsed = SSHConfig()
+    with open(path) as fd:
+        parsed.parse(fd)
+    _ssh_file_cache[path] = (stamp, parsed._config)
+    return parsed._config
+
+
 class Config(InvokeConfig):
     """
     An `invoke.config.Config` subclass with extra Fabric-related behavior.
@@ -151,7 +254,7 @@ class Config(InvokeConfig):
         # Arrive at some non-None SSHConfig object (upon which to run .parse()
         # later, in _load_ssh_file())
         if ssh_config is None:
-            ssh_config = SSHConfig()
+            ssh_config = CachedSSHConfig()
         self._set(base_ssh_config=ssh_config)
 
         # Now that our own attributes have been prepared & kwargs yanked, we
@@ -225,10 +328,17 @@ class Config(InvokeConfig):
         # bypassing any file loading. (Our extension of clone() above copies
         # over other attributes as well so that the end result looks consistent
         # with reality.)
-        new_config = SSHConfig()
+        new_config = CachedSSHConfig()
         # TODO: as with other spots, this implies SSHConfig needs a cleaner
         # public API re: creating and updating its core data.
-        new_config._config = copy.deepcopy(self.base_ssh_config._config)
+        rules = self.base_ssh_config._config
+        if isinstance(self.base_ssh_config, CachedSSHConfig):
+            # Our own rules are never modified once parsed (see
+            # _parse_ssh_file), so may be shared; which also lets the clone
+            # share lookup results with us.
+            new_config._config = list(rules)
+        else:
+            new_config._config = copy.deepcopy(rules)
         return dict(kwargs, ssh_config=new_config)
 
     def _load_ssh_files(self):
@@ -258,17 +368,22 @@ class Config(InvokeConfig):
         """
         Attempt to open and parse an SSH config file at ``path``.
 
-        Does nothing if ``path`` is not a path to a valid file.
+        Does nothing if ``path`` is not a path to a valid file. Files which
+        have not changed since they were last parsed (by any `.Config` in this
+        process) are not parsed again.
 
         :returns: ``None``.
         """
         if os.path.isfile(path):
-            old_rules = len(self.base_ssh_config._config)
-            with open(path) as fd:
-                self.base_ssh_config.parse(fd)
-            new_rules = len(self.base_ssh_config._config)
+            rules = _parse_ssh_file(path)
+            # TODO: as elsewhere, SSHConfig lacks a public API for adding
+            # already-parsed rules.
+            self.base_ssh_config._config.extend(rules)
+            if isinstance(self.base_ssh_config, CachedSSHConfig):
+                # Same as what CachedSSHConfig.parse() would have done.
+                self.base_ssh_config._lookups.clear()
             msg = "Loaded {} new ssh_config rules from {!r}"
-            debug(msg.format(new_rules - old_rules, path))
+            debug(msg.format(len(rules), path))
         else:
             debug("File not found, skipping")
 
@@ -307,6 +422,7 @@ class Config(InvokeConfig):
             # TODO 3.0: change to True and update all docs accordingly.
             "inline_ssh_env": False,
             "load_ssh_configs": True,
+            "pool": {"enabled": False, "idle_timeout": 60, "max_idle": 8},
             "port": 22,
             "run": {"replace_env": True},
             "runners": {"remote": Remote},
@@ -315,6 +431,9 @@ class Config(InvokeConfig):
             # TODO: this becomes an override/extend once Invoke grows execution
             # timeouts (which should be timeouts.execute)
             "timeouts": {"connect": None},
+            "translate_ssh_proxycommand": False,
+            "transport": {"keepalive": 30, "tcp_nodelay": True},
+            "tunnels": {"pool": False, "pool_size": 8},
             "user": get_local_user(),
         }
         merge_dicts(defaults, ours)
@@ -1,60 +1,172 @@
 from contextlib import contextmanager
-from threading import Event
+import copy
+import errno
+from threading import Event, Lock
 import logging
 
 try:
-    from invoke.vendor.six import StringIO
-    from invoke.vendor.decorator import decorator
     from invoke.vendor.six import string_types
+    from invoke.vendor.six.moves.queue import Queue, Empty, Full
 except ImportError:
-    from six import StringIO
-    from decorator import decorator
     from six import string_types
+    from six.moves.queue import Queue, Empty, Full
 import os.path
+import re
+import shlex
 import socket
+import weakref
 
 from invoke import Context
 from invoke.exceptions import ThreadException
+from invoke.util import ExceptionHandlingThread
+
+# NOTE: deferring these imports until first use would not speed up importing
+# Fabric: fabric.config needs paramiko (to subclass SSHConfig) regardless, and
+# importing any paramiko submodule loads the whole package. They also need to
+# stay module-level names, as fabric.testing's fixtures patch them here.
 from paramiko.agent import AgentRequestHandler
 from paramiko.client import SSHClient, AutoAddPolicy
-from paramiko.config import SSHConfig
 from paramiko.proxy import ProxyCommand
 
 from .config import Config
 from .exceptions import InvalidV1Env
+from .pool import client_pool, _freeze
 from .transfer import Transfer
-from .tunnels import TunnelManager, Tunnel
+from .tunnels import TunnelManager, Reactor, Relay, raise_thread_exception
+
 
+def _split_host_string(host_string):
+    """
+    Split a ``[user@]host[:port]`` string into a ``(user, host, port)`` tuple.
 
-@decorator
-def opens(method, self, *args, **kwargs):
-    self.open()
-    return method(self, *args, **kwargs)
+    Missing parts are ``None``; ``port`` is an integer when present.
+    """
+    # NOTE: partition() rather than split() & friends, to avoid building
+    # throwaway lists; this runs for every Connection instantiated.
+    user, _, hostport = host_string.rpartition("@")
+    port = None
+    # IPv4: can split on ':' reliably. IPv6 (>1 ':'): can't reliably tell where
+    # addr ends and port begins, so don't try (and don't bother adding special
+    # syntax either, user should avoid this situation by using port=).
+    if hostport.count(":") == 1:
+        hostport, _, port = hostport.partition(":")
+    return user or None, hostport or None, int(port) if port else None
 
 
 def derive_shorthand(host_string):
-    user_hostport = host_string.rsplit("@", 1)
-    hostport = user_hostport.pop()
-    user = user_hostport[0] if user_hostport and user_hostport[0] else None
-
-    # IPv6: can't reliably tell where addr ends and port begins, so don't
-    # try (and don't bother adding special syntax either, user should avoid
-    # this situation by using port=).
-    if hostport.count(":") > 1:
-        host = hostport
-        port = None
-    # IPv4: can split on ':' reliably.
-    else:
-        host_port = hostport.rsplit(":", 1)
-        host = host_port.pop(0) or None
-        port = host_port[0] if host_port and host_port[0] else None
-
-    if port is not None:
-        port = int(port)
-
+    user, host, port = _split_host_string(host_string)
     return {"user": user, "host": host, "port": port}
 
 
+# Tokens expanded within ProxyCommand-style gateway strings; see
+# _expand_proxy_command.
+_PROXY_COMMAND_TOKENS = re.compile(r"%[%hpr]|~")
+
+
+def _expand_proxy_command(command, host, port, user):
+    """
+    Expand the tokens OpenSSH supports in ``ProxyCommand`` values.
+
+    Namely ``%h`` (host), ``%p`` (port), ``%r`` (remote user), ``~`` (local
+    home directory) and ``%%`` (a literal ``%``). Done in a single pass so that
+    e.g. ``%%h`` yields a literal ``%h``.
+    """
+    replacements = {
+        "%%": "%",
+        "%h": host,
+        "%p": str(port),
+        "%r": user or "",
+        "~": os.path.expanduser("~"),
+    }
+    return _PROXY_COMMAND_TOKENS.sub(
+        lambda match: replacements[match.group()], command
+    )
+
+
+# Vanilla Invoke configs previously converted by _as_fabric_config, keyed by
+# id(); values are (weakref, data snapshot, converted Config) tuples.
+_converted_configs = {}
+
+
+def _as_fabric_config(config):
+    """
+    Return ``config`` as a `.Config`, creating or converting it if necessary.
+
+    Converting a vanilla `invoke.config.Config` means cloning it, which is
+    comparatively expensive; so the result is remembered and handed out again
+    for as long as the original object is alive and its data is unchanged.
+    """
+    if config is None:
+        return Config()
+    if isinstance(config, Config):
+        return config
+    key = id(config)
+    cached = _converted_configs.get(key)
+    if cached is not None and cached[0]() is config:
+        if cached[1] == config._config:
+            return cached[2]
+    converted = config.clone(into=Config)
+    ref = weakref.ref(config, lambda _: _converted_configs.pop(key, None))
+    snapshot = copy.deepcopy(config._config)
+    _converted_configs[key] = (ref, snapshot, converted)
+    return converted
+
+
+def _ssh_stdio_forward_hop(command, host, port):
+    """
+    Parse an expanded ``ssh -W <host>:<port> <hop>`` style proxy command.
+
+    Only the simplest form is recognized: the ``ssh`` program, forwarding to
+    exactly ``host:port``, with no options besides ``-q`` and ``-p <port>``.
+
+    :returns:
+        A ``(hop, hop_port)`` tuple (``hop_port`` being ``None`` if no ``-p``
+        was given) or ``None`` if ``command`` isn't of that form.
+    """
+    try:
+        words = shlex.split(command)
+    except ValueError:
+        return None
+    if not words or words[0] != "ssh":
+        return None
+    target = "{}:{}".format(host, port)
+    hop, hop_port, forwards = None, None, False
+    words = iter(words[1:])
+    for word in words:
+        if word in ("-W", "-p"):
+            word += next(words, "")
+        if word == "-q":
+            continue
+        elif word == "-W" + target:
+            forwards = True
+        elif word.startswith("-p") and word[2:].isdigit():
+            hop_port = int(word[2:])
+        elif word.startswith("-") or ":" in word or hop is not None:
+            return None
+        else:
+            hop = word
+    if not forwards or hop is None:
+        return None
+    return hop, hop_port
+
+
+def _is_idle_socket(sock):
+    """
+    Return whether ``sock`` is still connected, with nothing left to read.
+
+    Sockets which fail this check may not be handed to another forwarded
+    connection: leftover data (e.g. a late reply to the previous user) would
+    reach the wrong client, and a socket at EOF is of no use to anyone.
+    """
+    sock.setblocking(0)
+    try:
+        sock.recv(1, socket.MSG_PEEK)
+    except socket.error as e:
+        return e.errno in (errno.EAGAIN, errno.EWOULDBLOCK)
+    # Either there was data, or the far end hung up (an empty read).
+    return False
+
+
 class Connection(Context):
     """
     A connection to an SSH daemon, with methods for commands and file transfer.
@@ -145,12 +257,30 @@ class Connection(Context):
     forward_agent = None
     connect_timeout = None
     connect_kwargs = None
-    client = None
     transport = None
+    _client = None
+    _is_connected = False
+    _identity_cache = None
     _sftp = None
-    _agent_handler = None
+    _agent_handlers = None
+    _session_lock = None
+    _jump_gateway = None
     default_host_key_policy = AutoAddPolicy
 
+    def __setattr__(self, key, value):
+        # NOTE: DataProxy.__setattr__ decides whether ``key`` is a real
+        # attribute (vs a config key) via ``key in dir(self)``, which builds &
+        # sorts a list of every attribute name on each assignment, and
+        # __init__ alone makes a dozen of those. Checking the instance dict and
+        # the class directly gives the same answer far more cheaply.
+        if key in self.__dict__ or hasattr(type(self), key):
+            object.__setattr__(self, key, value)
+            # Identity (and thus hash) must follow changes to its components.
+            if key in ("host", "user", "port"):
+                object.__setattr__(self, "_identity_cache", None)
+        else:
+            super(Connection, self).__setattr__(key, value)
+
     @classmethod
     def from_v1(cls, env, **kwargs):
         """
@@ -188,13 +318,13 @@ class Connection(Context):
         # harder for users to intentionally overwrite!)
         connect_kwargs = kwargs.setdefault("connect_kwargs", {})
         kwargs.setdefault("host", env.host_string)
-        shorthand = derive_shorthand(env.host_string)
+        shorthand_port = _split_host_string(env.host_string)[2]
         # TODO: don't we need to do the below skipping for user too?
         kwargs.setdefault("user", env.user)
         # Skip port if host string seemed to have it; otherwise we hit our own
         # ambiguity clause in __init__. v1 would also have been doing this
         # anyways (host string wins over other settings).
-        if not shorthand["port"]:
+        if not shorthand_port:
             # Run port through int(); v1 inexplicably has a string default...
             kwargs.setdefault("port", int(env.port))
         # key_filename defaults to None in v1, but in v2, we expect it to be
@@ -209,6 +339,34 @@ class Connection(Context):
             kwargs["config"] = Config.from_v1(env)
         return cls(**kwargs)
 
+    @classmethod
+    def from_hosts(cls, hosts, config=None, **kwargs):
+        """
+        Alternate constructor creating one `.Connection` per host string.
+
+        Behaves like calling ``Connection(host, config=config, **kwargs)`` for
+        each item in ``hosts``, except that work which would otherwise be
+        repeated for every host is performed only once: all resulting objects
+        share a single `.Config` (created, or upgraded from a vanilla
+        `invoke.config.Config`, up front), so SSH config files are only loaded
+        and parsed once, and repeated lookups of the same host are served from
+        its cache.
+
+        :param hosts:
+            An iterable of host strings, in any format accepted by
+            `.Connection`'s ``host`` parameter.
+
+        :param config: As in `.Connection`.
+
+        All other keyword arguments are passed to every `.Connection`.
+
+        :returns: A `list` of `.Connection` objects, in the order given.
+
+        .. versionadded:: 2.6
+        """
+        config = _as_fabric_config(config)
+        return [cls(host, config=config, **kwargs) for host in hosts]
+
     # TODO: should "reopening" an existing Connection object that has been
     # closed, be allowed? (See e.g. how v1 detects closed/semi-closed
     # connections & nukes them before creating a new client to the same host.)
@@ -274,7 +432,9 @@ class Connection(Context):
             `.Connection` (e.g. default SSH port and so forth).
 
             Should be a `.Config` or an `invoke.config.Config`
-            (which will be turned into a `.Config`).
+            (which will be turned into a `.Config`; connections given the
+            same, unmodified `invoke.config.Config` share the resulting
+            `.Config`, just as they would share a `.Config` given directly.)
 
             Default is an anonymous `.Config` object.
 
@@ -367,36 +527,38 @@ class Connection(Context):
 
         .. versionchanged:: 2.3
             Added the ``inline_ssh_env`` parameter.
+        .. versionchanged:: 2.6
+            Reuse the `.Config` converted from a given `invoke.config.Config`
+            across connections, while the latter is unmodified.
         """
-        # NOTE: parent __init__ sets self._config; for now we simply overwrite
-        # that below. If it's somehow problematic we would want to break parent
-        # __init__ up in a manner that is more cleanly overrideable.
-        super(Connection, self).__init__(config=config)
-
         #: The .Config object referenced when handling default values (for e.g.
         #: user or port, when not explicitly given) or deciding how to behave.
-        if config is None:
-            config = Config()
-        # Handle 'vanilla' Invoke config objects, which need cloning 'into' one
-        # of our own Configs (which grants the new defaults, etc, while not
-        # squashing them if the Invoke-level config already accounted for them)
-        elif not isinstance(config, Config):
-            config = config.clone(into=Config)
-        self._set(_config=config)
+        # NOTE: resolved before calling parent __init__, which would otherwise
+        # create (and we'd discard) a vanilla Invoke config when given None.
+        # 'Vanilla' Invoke config objects need cloning 'into' one of our own
+        # Configs (which grants the new defaults, etc, while not squashing
+        # them if the Invoke-level config already accounted for them.)
+        config = _as_fabric_config(config)
+        super(Connection, self).__init__(config=config)
         # TODO: when/how to run load_files, merge, load_shell_env, etc?
         # TODO: i.e. what is the lib use case here (and honestly in invoke too)
 
-        shorthand = self.derive_shorthand(host)
-        host = shorthand["host"]
+        # Guards state shared by concurrently created sessions (see run_many)
+        self._session_lock = Lock()
+        # (channel, agent forwarding handler) pairs for our sessions; see
+        # create_session.
+        self._agent_handlers = []
+
+        shorthand_user, host, shorthand_port = self._split_shorthand(host)
         err = "You supplied the {} via both shorthand and kwarg! Please pick one."  # noqa
-        if shorthand["user"] is not None:
+        if shorthand_user is not None:
             if user is not None:
                 raise ValueError(err.format("user"))
-            user = shorthand["user"]
-        if shorthand["port"] is not None:
+            user = shorthand_user
+        if shorthand_port is not None:
             if port is not None:
                 raise ValueError(err.format("port"))
-            port = shorthand["port"]
+            port = shorthand_port
 
         # NOTE: we load SSH config data as early as possible as it has
         # potential to affect nearly every other attribute.
@@ -415,8 +577,9 @@ class Connection(Context):
         # TODO: is it _ever_ possible to give an empty user value (e.g.
         # user='')? E.g. do some SSH server specs allow for that?
 
-        #: The network port to connect on.
-        self.port = port or int(self.ssh_config.get("port", self.config.port))
+        #: The network port to connect on. Always an integer, even if given as
+        #: a string.
+        self.port = int(port or self.ssh_config.get("port", self.config.port))
 
         # Gateway/proxy/bastion/jump setting: non-None values - string,
         # Connection, even eg False - get set directly; None triggers seek in
@@ -452,10 +615,6 @@ class Connection(Context):
         #: `open` is called.
         self.connect_kwargs = self.resolve_connect_kwargs(connect_kwargs)
 
-        #: The `paramiko.client.SSHClient` instance this connection wraps.
-        self.client = SSHClient()
-        self.setup_ssh_client()
-
         #: A convenience handle onto the return value of
         #: ``self.client.get_transport()``.
         self.transport = None
@@ -466,6 +625,27 @@ class Connection(Context):
         #: inline.
         self.inline_ssh_env = inline_ssh_env
 
+    @property
+    def client(self):
+        """
+        The `paramiko.client.SSHClient` instance this connection wraps.
+
+        Created (and configured via `setup_ssh_client`) on first access, so
+        that `.Connection` objects which never connect - e.g. those only used
+        to resolve host parameters, or as dict keys - don't pay for it.
+
+        .. versionchanged:: 2.6
+            Now created on first access instead of at instantiation time.
+        """
+        if self._client is None:
+            self._client = SSHClient()
+            self.setup_ssh_client()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
     def setup_ssh_client(self):
         if self.default_host_key_policy is not None:
             logging.debug("host key policy: %s", self.default_host_key_policy)
@@ -498,13 +678,21 @@ class Connection(Context):
             conf_val = self.config.connect_kwargs["key_filename"]
             # Config value comes before kwarg value (because it may contain
             # CLI flag value.)
-            connect_kwargs["key_filename"] = conf_val + kwarg_val
+            connect_kwargs = dict(
+                connect_kwargs, key_filename=conf_val + kwarg_val
+            )
+        # NOTE: both the config and any explicitly given dict may be shared
+        # with other connections (e.g. via from_hosts), so must never be
+        # modified in place; take a (shallow) copy to work on instead.
+        connect_kwargs = dict(connect_kwargs)
 
         # SSH config identityfile values come last in the key_filename
         # 'hierarchy'.
         if "identityfile" in self.ssh_config:
-            connect_kwargs.setdefault("key_filename", [])
-            connect_kwargs["key_filename"].extend(
+            key_filename = connect_kwargs.get("key_filename", [])
+            if isinstance(key_filename, string_types):
+                key_filename = [key_filename]
+            connect_kwargs["key_filename"] = list(key_filename) + list(
                 self.ssh_config["identityfile"]
             )
 
@@ -524,7 +712,7 @@ class Connection(Context):
                 # TODO: in an ideal world we'd check user/port too in case they
                 # differ, but...seriously? They can file a PR with those extra
                 # half dozen test cases in play, E_NOTIME
-                if self.derive_shorthand(hop)["host"] == self.host:
+                if self._split_shorthand(hop)[1] == self.host:
                     return None
                 # Happily, ProxyJump uses identical format to our host
                 # shorthand...
@@ -569,7 +757,16 @@ class Connection(Context):
         # TODO: consider including gateway and maybe even other init kwargs?
         # Whether two cxns w/ same user/host/port but different
         # gateway/keys/etc, should be considered "the same", is unclear.
-        return (self.host, self.user, self.port)
+        return self._identity_and_hash()[0]
+
+    def _identity_and_hash(self):
+        # Memoized, as Connections are frequently used as dict keys (e.g. in
+        # GroupResult); __setattr__ resets this when host/user/port change.
+        cache = self._identity_cache
+        if cache is None:
+            identity = (self.host, self.user, self.port)
+            cache = self._identity_cache = (identity, hash(identity))
+        return cache
 
     def __eq__(self, other):
         if not isinstance(other, Connection):
@@ -582,7 +779,12 @@ class Connection(Context):
     def __hash__(self):
         # NOTE: this departs from Context/DataProxy, which is not usefully
         # hashable.
-        return hash(self._identity())
+        return self._identity_and_hash()[1]
+
+    def _pool_key(self):
+        # Pooled clients may only be shared between connections which would
+        # have connected to the same place in the same way.
+        return self._identity() + (_freeze(self.connect_kwargs), self.gateway)
 
     def derive_shorthand(self, host_string):
         # NOTE: used to be defined inline; preserving API call for both
@@ -590,6 +792,16 @@ class Connection(Context):
         # modify behavior later, using eg config or other attributes.
         return derive_shorthand(host_string)
 
+    def _split_shorthand(self, host_string):
+        # derive_shorthand() as a (user, host, port) tuple. Unless a subclass
+        # overrides it, the tuple is produced directly, skipping the dict.
+        # NOTE: == rather than 'is', as Python 2 creates a new unbound method
+        # object on each attribute access.
+        if type(self).derive_shorthand == Connection.derive_shorthand:
+            return _split_host_string(host_string)
+        shorthand = self.derive_shorthand(host_string)
+        return shorthand["user"], shorthand["host"], shorthand["port"]
+
     @property
     def is_connected(self):
         """
@@ -597,7 +809,14 @@ class Connection(Context):
 
         .. versionadded:: 2.0
         """
-        return self.transport.active if self.transport else False
+        # NOTE: the flag (maintained by open/close) avoids poking at the
+        # transport at all in the common never-opened/already-closed case; the
+        # transport is still consulted as the remote end may have hung up.
+        return (
+            self._is_connected
+            and self.transport is not None
+            and self.transport.active
+        )
 
     def open(self):
         """
@@ -613,7 +832,13 @@ class Connection(Context):
         `SSHClient.connect <paramiko.client.SSHClient.connect>`. (For details,
         see :doc:`the configuration docs </concepts/configuration>`.)
 
+        If the ``pool.enabled`` :ref:`setting <default-values>` is on, a client
+        previously released by `close` for the same target is reused instead
+        of connecting anew.
+
         .. versionadded:: 2.0
+        .. versionchanged:: 2.6
+            Added connection pooling support.
         """
         # Short-circuit
         if self.is_connected:
@@ -633,6 +858,16 @@ class Connection(Context):
             and self.connect_timeout is not None
         ):
             raise ValueError(err.format("timeout"))
+        # Reuse an already-connected client, if pooling allows it
+        if self.config.pool.enabled:
+            client = client_pool.acquire(
+                self._pool_key(), idle_timeout=self.config.pool.idle_timeout
+            )
+            if client is not None:
+                self.client = client
+                self.transport = client.get_transport()
+                self._is_connected = True
+                return
         # No conflicts -> merge 'em together
         kwargs = dict(
             self.connect_kwargs,
@@ -640,16 +875,41 @@ class Connection(Context):
             hostname=self.host,
             port=self.port,
         )
-        if self.gateway:
-            kwargs["sock"] = self.open_gateway()
         if self.connect_timeout:
             kwargs["timeout"] = self.connect_timeout
         # Strip out empty defaults for less noisy debugging
         if "key_filename" in kwargs and not kwargs["key_filename"]:
             del kwargs["key_filename"]
         # Actually connect!
-        self.client.connect(**kwargs)
+        try:
+            if self.gateway:
+                kwargs["sock"] = self.open_gateway()
+            self.client.connect(**kwargs)
+        except BaseException:
+            # Don't leave a hop we connected to on our behalf dangling.
+            self._close_jump_gateway()
+            raise
         self.transport = self.client.get_transport()
+        # Disable Nagle's algorithm, as OpenSSH does, so small command and
+        # response packets aren't held back waiting on delayed ACKs. Only
+        # applies to TCP sockets; gateway channels and ProxyCommands aren't
+        # sockets at all, and e.g. Unix sockets (given via connect_kwargs'
+        # "sock") reject the option.
+        sock = self.transport.sock
+        tcp = getattr(sock, "family", None) in (
+            socket.AF_INET,
+            socket.AF_INET6,
+        )
+        if self.config.transport.tcp_nodelay and tcp:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Send keepalives so idle (e.g. pooled, or gateway) connections aren't
+        # silently dropped by NAT/firewalls. SSH config wins, as usual.
+        keepalive = self.ssh_config.get(
+            "serveraliveinterval", self.config.transport.keepalive
+        )
+        if keepalive:
+            self.transport.set_keepalive(int(keepalive))
+        self._is_connected = True
 
     def open_gateway(self):
         """
@@ -661,19 +921,40 @@ class Connection(Context):
             was a string.
 
         .. versionadded:: 2.0
+        .. versionchanged:: 2.6
+            ``%p`` in `gateway` strings now expands to this connection's
+            actual port (it previously always expanded to ``22``), and ``%%``
+            now expands to a literal ``%``.
+        .. versionchanged:: 2.6
+            When the ``translate_ssh_proxycommand`` setting is enabled, string
+            gateways of the form ``ssh -W %h:%p <hop>`` are connected to
+            in-process, as if they had been given as ``ProxyJump <hop>``,
+            instead of by running ``ssh``; the result is then a
+            ``direct-tcpip`` `~paramiko.channel.Channel`.
         """
+        gateway = self.gateway
         # ProxyCommand is faster to set up, so do it first.
-        if isinstance(self.gateway, string_types):
-            # Leverage a dummy SSHConfig to ensure %h/%p/etc are parsed.
-            # TODO: use real SSH config once loading one properly is
-            # implemented.
-            ssh_conf = SSHConfig()
-            dummy = "Host {}\n    ProxyCommand {}"
-            ssh_conf.parse(StringIO(dummy.format(self.host, self.gateway)))
-            return ProxyCommand(ssh_conf.lookup(self.host)["proxycommand"])
+        if isinstance(gateway, string_types):
+            command = _expand_proxy_command(
+                gateway, self.host, self.port, self.user
+            )
+            hop = None
+            if self.config.translate_ssh_proxycommand:
+                hop = _ssh_stdio_forward_hop(command, self.host, self.port)
+            # NOTE: a hop equal to ourselves implies SSH config wildcards, as
+            # in get_gateway(); leave that to the subprocess to sort out.
+            if hop is None or self._split_shorthand(hop[0])[1] == self.host:
+                return ProxyCommand(command)
+            # Connect to the hop ourselves, as if it had been a ProxyJump.
+            kwargs = dict(config=self.config.clone())
+            if hop[1] is not None:
+                kwargs["port"] = hop[1]
+            # E.g. left over from an earlier open() which failed.
+            self._close_jump_gateway()
+            gateway = self._jump_gateway = Connection(hop[0], **kwargs)
         # Handle inner-Connection gateway type here.
         # TODO: logging
-        self.gateway.open()
+        gateway.open()
         # TODO: expose the opened channel itself as an attribute? (another
         # possible argument for separating the two gateway types...) e.g. if
         # someone wanted to piggyback on it for other same-interpreter socket
@@ -682,9 +963,9 @@ class Connection(Context):
         # object they got via $WHEREEVER?
         # TODO: how best to expose timeout param? reuse general connection
         # timeout from config?
-        return self.gateway.transport.open_channel(
+        return gateway.transport.open_channel(
             kind="direct-tcpip",
-            dest_addr=(self.host, int(self.port)),
+            dest_addr=(self.host, self.port),
             # NOTE: src_addr needs to be 'empty but not None' values to
             # correctly encode into a network message. Theoretically Paramiko
             # could auto-interpret None sometime & save us the trouble.
@@ -697,12 +978,48 @@ class Connection(Context):
 
         If no connection is open, this method does nothing.
 
+        When the ``pool.enabled`` :ref:`setting <default-values>` is on, the
+        underlying client is handed back to the connection pool (instead of
+        being disconnected) for reuse by later `open` calls, and this object
+        receives a fresh, unconnected client.
+
         .. versionadded:: 2.0
+        .. versionchanged:: 2.6
+            Added connection pooling support.
         """
-        if self.is_connected:
+        if not self.is_connected:
+            # We may still have connected to a hop, before failing to connect
+            # through it.
+            self._close_jump_gateway()
+            return
+        self._is_connected = False
+        with self._session_lock:
+            handlers, self._agent_handlers = self._agent_handlers, []
+        for _, handler in handlers:
+            handler.close()
+        if not self.config.pool.enabled:
             self.client.close()
-            if self.forward_agent and self._agent_handler is not None:
-                self._agent_handler.close()
+        else:
+            # Our SFTP session is not worth keeping around on somebody else's
+            # client.
+            if self._sftp is not None:
+                self._sftp.close()
+                self._sftp = None
+            client_pool.release(
+                self._pool_key(),
+                self.client,
+                max_idle=self.config.pool.max_idle,
+            )
+            self.client = None
+            self.transport = None
+        self._close_jump_gateway()
+
+    def _close_jump_gateway(self):
+        # Hops we connected to on our own behalf (see open_gateway) are ours
+        # to close (or pool) as well.
+        if self._jump_gateway is not None:
+            self._jump_gateway.close()
+            self._jump_gateway = None
 
     def __enter__(self):
         return self
@@ -710,17 +1027,28 @@ class Connection(Context):
     def __exit__(self, *exc):
         self.close()
 
-    @opens
     def create_session(self):
+        self.open()
         channel = self.transport.open_session()
         if self.forward_agent:
-            self._agent_handler = AgentRequestHandler(channel)
+            # Each new handler replaces the previous one as the transport's
+            # sole agent handler, but closing an old handler closes agent
+            # connections still in use by its session. So they're kept until
+            # their session's channel has closed (or until close()).
+            handler = AgentRequestHandler(channel)
+            with self._session_lock:
+                finished = [x for x in self._agent_handlers if x[0].closed]
+                self._agent_handlers = [
+                    x for x in self._agent_handlers if not x[0].closed
+                ]
+                self._agent_handlers.append((channel, handler))
+            for _, old in finished:
+                old.close()
         return channel
 
     def _remote_runner(self):
         return self.config.runners.remote(self, inline_env=self.inline_ssh_env)
 
-    @opens
     def run(self, command, **kwargs):
         """
         Execute a shell command on the remote end of this connection.
@@ -735,9 +1063,9 @@ class Connection(Context):
 
         .. versionadded:: 2.0
         """
+        self.open()
         return self._run(self._remote_runner(), command, **kwargs)
 
-    @opens
     def sudo(self, command, **kwargs):
         """
         Execute a shell command, via ``sudo``, on the remote end.
@@ -749,8 +1077,72 @@ class Connection(Context):
 
         .. versionadded:: 2.0
         """
+        self.open()
         return self._sudo(self._remote_runner(), command, **kwargs)
 
+    def run_many(self, commands, workers=8, **kwargs):
+        """
+        Execute several shell commands at once on the remote end.
+
+        Each command is executed as if by `run` (receiving any other keyword
+        arguments given), in its own channel; up to ``workers`` commands run
+        at the same time, all multiplexed over this connection's single SSH
+        transport, instead of one after another.
+
+        :param commands: An iterable of command strings.
+
+        :param int workers:
+            Maximum number of commands to execute at once. Default: ``8``.
+
+        :returns:
+            A `list` of `~invoke.runners.Result` objects, one per command, in
+            the order the commands were given.
+
+        :raises:
+            The exception raised by the first command (in the order given)
+            which raised one, e.g. `~invoke.exceptions.UnexpectedExit`, once
+            all commands have finished. Give ``warn=True`` to obtain results
+            for failing commands instead.
+
+            ``ValueError``, before anything runs, if ``workers`` is less
+            than 1.
+
+        .. versionadded:: 2.6
+        """
+        if workers < 1:
+            err = "workers must be at least 1, not {!r}"
+            raise ValueError(err.format(workers))
+        # Connect up front, instead of racing to do so from every worker.
+        self.open()
+        jobs = Queue()
+        for job in enumerate(commands):
+            jobs.put(job)
+        results = [None] * jobs.qsize()
+        errors = {}
+
+        def worker():
+            while True:
+                try:
+                    index, command = jobs.get(block=False)
+                except Empty:
+                    return
+                try:
+                    results[index] = self.run(command, **kwargs)
+                except BaseException as e:
+                    errors[index] = e
+
+        threads = [
+            ExceptionHandlingThread(target=worker)
+            for _ in range(min(workers, len(results)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[min(errors)]
+        return results
+
     def local(self, *args, **kwargs):
         """
         Execute a shell command on the local system.
@@ -764,7 +1156,6 @@ class Connection(Context):
         # straight.
         return super(Connection, self).run(*args, **kwargs)
 
-    @opens
     def sftp(self):
         """
         Return a `~paramiko.sftp_client.SFTPClient` object.
@@ -776,6 +1167,7 @@ class Connection(Context):
 
         .. versionadded:: 2.0
         """
+        self.open()
         if self._sftp is None:
             self._sftp = self.client.open_sftp()
         return self._sftp
@@ -806,7 +1198,6 @@ class Connection(Context):
     # (perhaps factor out socket creation itself)?
     # TODO: probably push some of this down into Paramiko
     @contextmanager
-    @opens
     def forward_local(
         self,
         local_port,
@@ -854,6 +1245,7 @@ class Connection(Context):
 
         .. versionadded:: 2.0
         """
+        self.open()
         if not remote_port:
             remote_port = local_port
 
@@ -878,7 +1270,7 @@ class Connection(Context):
         # Teardown once user exits block
         finally:
             # Signal to manager that it should close all open tunnels
-            finished.set()
+            manager.stop()
             # Then wait for it to do so
             manager.join()
             # Raise threading errors from within the manager, which would be
@@ -905,7 +1297,6 @@ class Connection(Context):
 
     # TODO: probably push some of this down into Paramiko
     @contextmanager
-    @opens
     def forward_remote(
         self,
         remote_port,
@@ -956,7 +1347,43 @@ class Connection(Context):
             local operating system state.
 
         .. versionadded:: 2.0
+        .. versionchanged:: 2.6
+            Reuse local sockets across forwarded connections when the
+            ``tunnels.pool`` config setting is enabled.
         """
+        reactor = Reactor()
+        reactor.start()
+        try:
+            with self._forward_remote(
+                reactor=reactor,
+                remote_port=remote_port,
+                local_port=local_port,
+                remote_host=remote_host,
+                local_host=local_host,
+            ):
+                yield
+        finally:
+            # NOTE: _forward_remote normally does this itself, but may have
+            # blown up before getting that far.
+            reactor.stop()
+            reactor.join()
+        # Raise errors from within the reactor, as forward_local does.
+        raise_thread_exception(reactor)
+
+    @contextmanager
+    def _forward_remote(
+        self,
+        reactor,
+        remote_port,
+        local_port=None,
+        remote_host="127.0.0.1",
+        local_host="localhost",
+    ):
+        # The guts of forward_remote, relaying via an already-started Reactor
+        # which may be shared with other connections (see
+        # Group.forward_remote). Stops it on the way out, but leaves raising
+        # its errors to the caller.
+        self.open()
         if not local_port:
             local_port = remote_port
         # Callback executes on each connection to the remote port and is given
@@ -964,9 +1391,9 @@ class Connection(Context):
         # source/dest host/port pairs at all; only whether the channel has data
         # to read and suchlike.)
         # We then pair that channel with a new 'outbound' socket connection to
-        # the local host/port being forwarded, in a new Tunnel.
-        # That Tunnel is then added to a shared data structure so we can track
-        # & close them during shutdown.
+        # the local host/port being forwarded, in a new Relay.
+        # That Relay is then handed to a Reactor thread, which services all
+        # of them & closes them during shutdown.
         #
         # TODO: this approach is less than ideal because we have to share state
         # between ourselves & the callback handed into the transport's own
@@ -974,19 +1401,49 @@ class Connection(Context):
         # TunnelManager for local forwarding). See if we can use more of
         # Paramiko's API (or improve it and then do so) so that isn't
         # necessary.
-        tunnels = []
+        # Idle, still-connected local sockets left over from finished tunnels,
+        # if the user has opted into reusing them.
+        idle_socks = None
+        if self.config.tunnels.pool:
+            idle_socks = Queue(maxsize=self.config.tunnels.pool_size)
+
+        def release(sock):
+            # Relays only call this when pooling (see callback), with sockets
+            # whose tunnel ended cleanly; that doesn't mean nothing more will
+            # turn up on them, though.
+            if not _is_idle_socket(sock):
+                return sock.close()
+            try:
+                idle_socks.put_nowait(sock)
+            except Full:
+                sock.close()
 
         def callback(channel, src_addr_tup, dst_addr_tup):
-            sock = socket.socket()
-            # TODO: handle connection failure such that channel, etc get closed
-            sock.connect((local_host, local_port))
-            # TODO: we don't actually need to generate the Events at our level,
-            # do we? Just let Tunnel.__init__ do it; all we do is "press its
-            # button" on shutdown...
-            tunnel = Tunnel(channel=channel, sock=sock, finished=Event())
-            tunnel.start()
-            # Communication between ourselves & the Paramiko handling subthread
-            tunnels.append(tunnel)
+            sock = None
+            # Skip over pooled sockets which became unusable while idle.
+            while idle_socks is not None and sock is None:
+                try:
+                    sock = idle_socks.get_nowait()
+                except Empty:
+                    break
+                if not _is_idle_socket(sock):
+                    sock.close()
+                    sock = None
+            if sock is None:
+                sock = socket.socket()
+                # TODO: handle connection failure such that channel, etc get
+                # closed
+                sock.connect((local_host, local_port))
+                # As TunnelManager does for forward_local's sockets.
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            reactor.add(
+                Relay(
+                    channel=channel,
+                    sock=sock,
+                    release=release if idle_socks is not None else None,
+                    buffers=reactor.buffers,
+                )
+            )
 
         # Ask Paramiko (really, the remote sshd) to call our callback whenever
         # connections are established on the remote iface/port.
@@ -997,14 +1454,15 @@ class Connection(Context):
             )
             yield
         finally:
-            # TODO: see above re: lack of a TunnelManager
-            # TODO: and/or also refactor with TunnelManager re: shutdown logic.
-            # E.g. maybe have a non-thread TunnelManager-alike with a method
-            # that acts as the callback? At least then there's a tiny bit more
-            # encapsulation...meh.
-            for tunnel in tunnels:
-                tunnel.finished.set()
-                tunnel.join()
+            # Tell the reactor to close any open relays, then cancel the
+            # forward (a network round-trip) while it does so.
+            reactor.stop()
             self.transport.cancel_port_forward(
                 address=remote_host, port=remote_port
             )
+            # Once it's done, relays' sockets have gone to release(), and so
+            # have those of any relays which arrived too late for the reactor
+            # (there can be no more after canceling); drain them all.
+            reactor.join()
+            while idle_socks is not None and not idle_socks.empty():
+                idle_socks.get_nowait().close()
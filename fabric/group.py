@@ -1,12 +1,25 @@
+from contextlib import contextmanager
+
 try:
-    from invoke.vendor.six.moves.queue import Queue
+    from invoke.vendor.six.moves.queue import Queue, Empty
 except ImportError:
-    from six.moves.queue import Queue
+    from six.moves.queue import Queue, Empty
 
+from invoke.exceptions import ThreadException
 from invoke.util import ExceptionHandlingThread
 
 from .connection import Connection
 from .exceptions import GroupException
+from .tunnels import Reactor, raise_thread_exception
+
+
+class _PendingConnection(object):
+    # Stand-in, within a Group, for a Connection nobody has asked for yet.
+    __slots__ = ("host", "kwargs")
+
+    def __init__(self, host, kwargs):
+        self.host = host
+        self.kwargs = kwargs
 
 
 class Group(list):
@@ -55,14 +68,28 @@ class Group(list):
             <Connection host='notahost'>: gaierror(...),
         }
 
+    Members which are equal to an earlier member (i.e. connect to the same
+    host & port as the same user) are skipped by methods like `run`, as their
+    results would only replace that member's anyway. Set `allow_duplicates`
+    to execute on them regardless.
+
     As with `.Connection`, `.Group` objects may be used as context managers,
     which will automatically `.close` the object on block exit.
 
     .. versionadded:: 2.0
     .. versionchanged:: 2.4
         Added context manager behavior.
+    .. versionchanged:: 2.6
+        Skip duplicate members, unless `allow_duplicates` is set.
+    .. versionchanged:: 2.6
+        Member `Connections <.Connection>` given as host strings are created
+        the first time they are accessed, instead of up front.
     """
 
+    #: Whether methods such as `run` should also execute on members equal to
+    #: an earlier member, instead of skipping them.
+    allow_duplicates = False
+
     def __init__(self, *hosts, **kwargs):
         """
         Create a group of connections from one or more shorthand host strings.
@@ -80,11 +107,20 @@ class Group(list):
                 "host1", "host2", "host3", user="admin", forward_agent=True,
             )
 
+        The `.Connection` objects themselves are only created when first
+        accessed (by indexing, iterating, calling methods like `.Group.run`,
+        etc), so large groups of which only a few members end up being used
+        stay cheap.
+        This also means errors from the `.Connection` constructor (such as
+        malformed host strings) surface at that point instead.
+
         .. versionchanged:: 2.3
             Added ``**kwargs`` (was previously only ``*hosts``).
+        .. versionchanged:: 2.6
+            Create `.Connection` objects lazily.
         """
         # TODO: #563, #388 (could be here or higher up in Program area)
-        self.extend([Connection(host, **kwargs) for host in hosts])
+        self.extend([_PendingConnection(host, kwargs) for host in hosts])
 
     @classmethod
     def from_connections(cls, connections):
@@ -99,6 +135,122 @@ class Group(list):
         group.extend(connections)
         return group
 
+    def _resolve(self, index):
+        # Return the Connection at index, creating it first if necessary.
+        cxn = list.__getitem__(self, index)
+        if isinstance(cxn, _PendingConnection):
+            cxn = Connection(cxn.host, **cxn.kwargs)
+            list.__setitem__(self, index, cxn)
+        return cxn
+
+    def _resolve_all(self):
+        for index in range(len(self)):
+            self._resolve(index)
+
+    def _resolve_operands(self, other):
+        # Binary operations (comparison, concatenation) read both operands
+        self._resolve_all()
+        if isinstance(other, Group):
+            other._resolve_all()
+
+    # NOTE: everything below which reads the list's contents has to go through
+    # _resolve(), so _PendingConnection objects never leak out.
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._resolve(x) for x in range(*index.indices(len(self)))]
+        return self._resolve(index)
+
+    def __getslice__(self, start, stop):  # Python 2 only
+        start, stop = max(0, start), max(0, stop)
+        return self[start:stop]
+
+    def __iter__(self):
+        # Like list iterators, cope with the list changing size along the way
+        index = 0
+        while index < len(self):
+            yield self._resolve(index)
+            index += 1
+
+    def __reversed__(self):
+        index = len(self) - 1
+        while index >= 0:
+            if index < len(self):
+                yield self._resolve(index)
+            index -= 1
+
+    def __contains__(self, item):
+        self._resolve_all()
+        return super(Group, self).__contains__(item)
+
+    def __eq__(self, other):
+        self._resolve_operands(other)
+        return super(Group, self).__eq__(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __lt__(self, other):
+        self._resolve_operands(other)
+        return super(Group, self).__lt__(other)
+
+    def __le__(self, other):
+        self._resolve_operands(other)
+        return super(Group, self).__le__(other)
+
+    def __gt__(self, other):
+        self._resolve_operands(other)
+        return super(Group, self).__gt__(other)
+
+    def __ge__(self, other):
+        self._resolve_operands(other)
+        return super(Group, self).__ge__(other)
+
+    def __add__(self, other):
+        self._resolve_operands(other)
+        return super(Group, self).__add__(other)
+
+    def __radd__(self, other):
+        # Only reached for plain lists (list + Group), which would otherwise
+        # copy our raw contents.
+        if not isinstance(other, list):
+            return NotImplemented
+        return other + self[:]
+
+    def __mul__(self, count):
+        self._resolve_all()
+        return super(Group, self).__mul__(count)
+
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        self._resolve_all()
+        return super(Group, self).__repr__()
+
+    def count(self, item):
+        self._resolve_all()
+        return super(Group, self).count(item)
+
+    def copy(self):
+        return self[:]
+
+    def index(self, item, *args):
+        self._resolve_all()
+        return super(Group, self).index(item, *args)
+
+    def remove(self, item):
+        self._resolve_all()
+        return super(Group, self).remove(item)
+
+    def pop(self, index=-1):
+        self._resolve(index)
+        return super(Group, self).pop(index)
+
+    def sort(self, *args, **kwargs):
+        self._resolve_all()
+        return super(Group, self).sort(*args, **kwargs)
+
     def run(self, *args, **kwargs):
         """
         Executes `.Connection.run` on all member `Connections <.Connection>`.
@@ -111,7 +263,6 @@ class Group(list):
         # TODO: how to change method of execution across contents? subclass,
         # kwargs, additional methods, inject an executor? Doing subclass for
         # now, but not 100% sure it's the best route.
-        # TODO: also need way to deal with duplicate connections (see THOUGHTS)
         # TODO: and errors - probably FailureSet? How to handle other,
         # regular, non Failure, exceptions though? Still need an aggregate
         # exception type either way, whether it is FailureSet or what...
@@ -147,6 +298,77 @@ class Group(list):
         # TODO: actually implement on subclasses
         raise NotImplementedError
 
+    @contextmanager
+    def forward_remote(self, *args, **kwargs):
+        """
+        Executes `.Connection.forward_remote` on all member `Connections
+        <.Connection>`.
+
+        Takes the same arguments and, likewise, is a context manager: every
+        member's port forward is requested on entry and canceled on exit.
+        `.ThreadingGroup` does both for all members concurrently, instead of
+        waiting on one network round-trip after another. Either way, data for
+        every forwarded connection, across all members, is relayed by a
+        single thread.
+
+        If any member's forward can't be set up, the others are torn down
+        again and a `.GroupException` is raised, whose result maps failing
+        connections to their exceptions (and the rest to ``None``.) Failures
+        during teardown are raised the same way.
+
+        .. versionadded:: 2.6
+        """
+        reactor = Reactor()
+        managers = {}
+
+        def enter(cxn):
+            manager = cxn._forward_remote(reactor, *args, **kwargs)
+            manager.__enter__()
+            managers[cxn] = manager
+
+        def exit(cxn):
+            manager = managers.pop(cxn, None)
+            if manager is not None:
+                manager.__exit__(None, None, None)
+
+        reactor.start()
+        try:
+            results, excepted = self._execute(func=enter)
+            try:
+                if excepted:
+                    raise GroupException(results)
+                yield
+            finally:
+                # Have every member's relays closed at once, up front, rather
+                # than as part of whichever member's teardown happens first.
+                reactor.stop()
+                results, excepted = self._execute(func=exit)
+                if excepted:
+                    raise GroupException(results)
+        finally:
+            reactor.stop()
+            reactor.join()
+        raise_thread_exception(reactor)
+
+    def _execute(self, args=(), kwargs=None, func=None):
+        # Call func(cxn, *args, **kwargs) - by default, cxn.run(*args,
+        # **kwargs) - for every one of our _targets(), in whatever fashion the
+        # subclass implements. Returns a GroupResult of return values or
+        # exceptions, plus whether any exceptions occurred.
+        raise NotImplementedError
+
+    def _targets(self):
+        # Members to execute on, in order, minus duplicates unless allowed.
+        if self.allow_duplicates:
+            return list(self)
+        seen = set()
+        targets = []
+        for cxn in self:
+            if cxn not in seen:
+                seen.add(cxn)
+                targets.append(cxn)
+        return targets
+
     def close(self):
         """
         Executes `.Connection.close` on all member `Connections <.Connection>`.
@@ -171,38 +393,121 @@ class SerialGroup(Group):
     """
 
     def run(self, *args, **kwargs):
-        results = GroupResult()
+        results, excepted = self._execute(args, kwargs)
+        if excepted:
+            raise GroupException(results)
+        return results
+
+    def _execute(self, args=(), kwargs=None, func=None):
+        func = func or _run
+        kwargs = kwargs or {}
+        # NOTE: GroupResult is built in one go, as each of its __setitem__
+        # calls would also reset its caches.
+        pairs = []
         excepted = False
-        for cxn in self:
+        for cxn in self._targets():
             try:
-                results[cxn] = cxn.run(*args, **kwargs)
+                pairs.append((cxn, func(cxn, *args, **kwargs)))
             except Exception as e:
-                results[cxn] = e
+                pairs.append((cxn, e))
                 excepted = True
-        if excepted:
-            raise GroupException(results)
-        return results
+        return GroupResult(pairs), excepted
+
+
+def _run(cxn, *args, **kwargs):
+    return cxn.run(*args, **kwargs)
+
+
+def thread_worker(jobs, queue, args, kwargs, func=None):
+    # Run each Connection we can get our hands on, until none are left. (Or
+    # rather, call func with it, if given, instead of its run method.)
+    func = func or _run
+    while True:
+        try:
+            cxn = jobs.get(block=False)
+        except Empty:
+            return
+        # NOTE: BaseException, so that e.g. SystemExit is reported against the
+        # connection it happened on, as happened back when each connection had
+        # its own thread.
+        try:
+            result = func(cxn, *args, **kwargs)
+        except BaseException as e:
+            # TODO: namedtuple or attrs object?
+            queue.put((cxn, e, True))
+        else:
+            queue.put((cxn, result, False))
 
 
-def thread_worker(cxn, queue, args, kwargs):
-    result = cxn.run(*args, **kwargs)
-    # TODO: namedtuple or attrs object?
-    queue.put((cxn, result))
+_WORKERS_ERROR = "workers must be at least 1 (or None for no limit), not {!r}"
 
 
 class ThreadingGroup(Group):
     """
     Subclass of `.Group` which uses threading to execute concurrently.
 
+    Connections are handed out to a pool of worker threads (see `workers`),
+    each of which executes one connection's method call at a time until none
+    remain.
+
     .. versionadded:: 2.0
+    .. versionchanged:: 2.6
+        Use a pool of worker threads (whose size may be limited via
+        `workers`) instead of always starting one thread per connection.
     """
 
+    #: Maximum number of worker threads to use at once. When ``None`` (the
+    #: default), there is one worker per connection, i.e. everything executes
+    #: at once.
+    workers = None
+
+    def __init__(self, *hosts, **kwargs):
+        """
+        Create a group of connections, as with `.Group`.
+
+        :param int workers:
+            Sets `workers`. Not forwarded to the `.Connection` constructors,
+            unlike other keyword arguments.
+
+        :raises: ``ValueError`` if ``workers`` is less than 1.
+
+        .. versionchanged:: 2.6
+            Added the ``workers`` argument.
+        """
+        workers = kwargs.pop("workers", None)
+        if workers is not None and workers < 1:
+            raise ValueError(_WORKERS_ERROR.format(workers))
+        super(ThreadingGroup, self).__init__(*hosts, **kwargs)
+        if workers is not None:
+            self.workers = workers
+
+    def _worker_count(self, jobs):
+        if self.workers is None:
+            return jobs
+        # The attribute may also have been set directly.
+        if self.workers < 1:
+            raise ValueError(_WORKERS_ERROR.format(self.workers))
+        return min(jobs, self.workers)
+
     def run(self, *args, **kwargs):
-        results = GroupResult()
+        results, excepted = self._execute(args, kwargs)
+        if excepted:
+            raise GroupException(results)
+        return results
+
+    def _execute(self, args=(), kwargs=None, func=None):
+        kwargs = kwargs or {}
+        jobs = Queue()
+        targets = self._targets()
+        for cxn in targets:
+            jobs.put(cxn)
         queue = Queue()
+        count = self._worker_count(len(targets))
         threads = []
-        for cxn in self:
-            my_kwargs = dict(cxn=cxn, queue=queue, args=args, kwargs=kwargs)
+        for _ in range(count):
+            my_kwargs = dict(jobs=jobs, queue=queue, args=args, kwargs=kwargs)
+            if func is not None:
+                my_kwargs["func"] = func
             thread = ExceptionHandlingThread(
                 target=thread_worker, kwargs=my_kwargs
             )
@@ -214,31 +519,26 @@ class ThreadingGroup(Group):
             # TODO: (in sudo's version) configurability around interactive
             # prompting resulting in an exception instead, as in v1
             thread.join()
-        # Get non-exception results from queue
+        # Get results, including exceptions, from queue. (Collected first and
+        # handed to GroupResult in one go; see SerialGroup._execute.)
+        pairs = []
+        excepted = False
         while not queue.empty():
             # TODO: io-sleep? shouldn't matter if all threads are now joined
-            cxn, result = queue.get(block=False)
+            cxn, result, failed = queue.get(block=False)
             # TODO: outstanding musings about how exactly aggregate results
             # ought to ideally operate...heterogenous obj like this, multiple
             # objs, ??
-            results[cxn] = result
-        # Get exceptions from the threads themselves.
-        # TODO: in a non-thread setup, this would differ, e.g.:
-        # - a queue if using multiprocessing
-        # - some other state-passing mechanism if using e.g. coroutines
-        # - ???
-        excepted = False
-        for thread in threads:
-            wrapper = thread.exception()
-            if wrapper is not None:
-                # Outer kwargs is Thread instantiation kwargs, inner is kwargs
-                # passed to thread target/body.
-                cxn = wrapper.kwargs["kwargs"]["cxn"]
-                results[cxn] = wrapper.value
-                excepted = True
-        if excepted:
-            raise GroupException(results)
-        return results
+            pairs.append((cxn, result))
+            excepted = excepted or failed
+        results = GroupResult(pairs)
+        # Workers catch everything their connections raise, so anything
+        # found here is a problem with the worker itself; don't hide it.
+        wrappers = [x.exception() for x in threads]
+        wrappers = [x for x in wrappers if x is not None]
+        if wrappers:
+            raise ThreadException(wrappers)
+        return results, excepted
 
 
 class GroupResult(dict):
@@ -259,26 +559,88 @@ class GroupResult(dict):
       - Of note, these attributes allow high level logic, e.g. ``if
         mygroup.run('command').failed`` and so forth.
 
+    - Has "columnar" attributes such as `.exit_codes` and `.stdouts`, listing
+      one attribute of every result, in the same order as `values`; e.g.
+      ``max(mygroup.run('command', warn=True).exit_codes)``.
+
+    All of these derived attributes are computed on first access and cached
+    until the object is next modified. (The columnar attributes return a new
+    copy of the cached list each time.)
+
     .. versionadded:: 2.0
+    .. versionchanged:: 2.6
+        Added the columnar attributes, and made the derived attributes stay
+        current when the object is modified after first accessing them.
     """
 
     def __init__(self, *args, **kwargs):
-        super(dict, self).__init__(*args, **kwargs)
+        super(GroupResult, self).__init__(*args, **kwargs)
+        self._invalidate()
+
+    def _invalidate(self):
         self._successes = {}
         self._failures = {}
+        self._columns = {}
+
+    def __setitem__(self, key, value):
+        super(GroupResult, self).__setitem__(key, value)
+        self._invalidate()
+
+    def __delitem__(self, key):
+        super(GroupResult, self).__delitem__(key)
+        self._invalidate()
+
+    def clear(self):
+        super(GroupResult, self).clear()
+        self._invalidate()
+
+    def pop(self, *args):
+        value = super(GroupResult, self).pop(*args)
+        self._invalidate()
+        return value
+
+    def popitem(self):
+        item = super(GroupResult, self).popitem()
+        self._invalidate()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = super(GroupResult, self).setdefault(key, default)
+        self._invalidate()
+        return value
+
+    def update(self, *args, **kwargs):
+        super(GroupResult, self).update(*args, **kwargs)
+        self._invalidate()
+
+    def __ior__(self, other):
+        # As dict's own |= (Python 3.9+), which bypasses update().
+        self.update(other)
+        return self
 
     def _bifurcate(self):
         # Short-circuit to avoid reprocessing every access.
         if self._successes or self._failures:
             return
-        # TODO: if we ever expect .succeeded/.failed to be useful before a
-        # GroupResult is fully initialized, this needs to become smarter.
         for key, value in self.items():
             if isinstance(value, BaseException):
                 self._failures[key] = value
             else:
                 self._successes[key] = value
 
+    def _column(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            column = []
+            for value in self.values():
+                # Exceptions such as UnexpectedExit carry the offending result
+                if isinstance(value, BaseException):
+                    value = getattr(value, "result", None)
+                column.append(getattr(value, name, None))
+            self._columns[name] = column
+        # A copy, so callers modifying it can't corrupt the cache.
+        return list(column)
+
     @property
     def succeeded(self):
         """
@@ -298,3 +660,37 @@ class GroupResult(dict):
         """
         self._bifurcate()
         return self._failures
+
+    @property
+    def exit_codes(self):
+        """
+        A list of every result's exit code, in the same order as `values`.
+
+        Exceptions are represented by their ``result``'s exit code (e.g. for
+        `~invoke.exceptions.UnexpectedExit`) or ``None`` if they have none.
+
+        .. versionadded:: 2.6
+        """
+        return self._column("exited")
+
+    @property
+    def stdouts(self):
+        """
+        A list of every result's ``stdout``, in the same order as `values`.
+
+        Exceptions are handled as in `exit_codes`.
+
+        .. versionadded:: 2.6
+        """
+        return self._column("stdout")
+
+    @property
+    def stderrs(self):
+        """
+        A list of every result's ``stderr``, in the same order as `values`.
+
+        Exceptions are handled as in `exit_codes`.
+
+        .. versionadded:: 2.6
+        """
+        return self._column("stderr")
@@ -0,0 +1,140 @@
+"""
+Connection pooling internals.
+
+Pooling is disabled by default; see the ``pool`` settings under
+:ref:`default-values` for how to turn it on.
+"""
+
+import atexit
+from collections import defaultdict, deque
+from threading import Lock
+import time
+
+from .util import debug
+
+
+def _freeze(value):
+    """
+    Return a hashable equivalent of ``value`` (e.g. a ``connect_kwargs`` dict).
+
+    Lists and tuples become tuples, dict-likes (including config subtrees)
+    become frozensets of their (frozen) items; anything else is returned as-is.
+    """
+    if hasattr(value, "items"):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(x) for x in value)
+    return value
+
+
+class SSHClientPool(object):
+    """
+    Holds on to connected `~paramiko.client.SSHClient` objects for later reuse.
+
+    Clients are stored under a key describing the connection they represent
+    (`.Connection` uses its host, user, port, gateway and ``connect_kwargs``),
+    so a new `.Connection` to the same target can skip the network and
+    authentication handshakes entirely.
+
+    Idle clients are discarded lazily: every `acquire` closes and forgets
+    clients which have been idle for longer than the requested timeout or
+    whose transport has gone inactive in the meantime.
+
+    .. versionadded:: 2.6
+    """
+
+    def __init__(self):
+        self._clients = defaultdict(deque)
+        self._lock = Lock()
+
+    def acquire(self, key, idle_timeout=None):
+        """
+        Return a live client previously released under ``key``, or ``None``.
+
+        :param key: A hashable identifying the desired connection target.
+
+        :param idle_timeout:
+            Maximum number of seconds a client may have been sitting in the
+            pool to still be handed out. ``None`` means no limit.
+        """
+        with self._lock:
+            stale = self._expire(idle_timeout)
+            client = None
+            entries = self._clients.get(key)
+            if entries:
+                client, _ = entries.pop()
+                if not entries:
+                    del self._clients[key]
+        for old in stale:
+            old.close()
+        if client is not None:
+            debug("Reusing pooled client for {!r}".format(key))
+        return client
+
+    def release(self, key, client, max_idle=None):
+        """
+        Store ``client`` under ``key`` so a later `acquire` may reuse it.
+
+        Clients whose transport is no longer active are closed instead.
+
+        :param max_idle:
+            Maximum number of clients to hold on to under ``key``; if storing
+            ``client`` exceeds it, the longest-idle client for that key is
+            closed. ``None`` means no limit.
+        """
+        transport = client.get_transport()
+        if transport is None or not transport.active:
+            client.close()
+            return
+        evicted = None
+        with self._lock:
+            entries = self._clients[key]
+            entries.append((client, time.time()))
+            if max_idle is not None and len(entries) > max_idle:
+                evicted, _ = entries.popleft()
+                if not entries:
+                    del self._clients[key]
+        if evicted is not None:
+            evicted.close()
+
+    def clear(self):
+        """
+        Close and forget every pooled client.
+        """
+        with self._lock:
+            entries = [x for queue in self._clients.values() for x in queue]
+            self._clients.clear()
+        for client, _ in entries:
+            client.close()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(x) for x in self._clients.values())
+
+    def _expire(self, idle_timeout):
+        # NOTE: must be called with the lock held; returns clients the caller
+        # should close once it has released the lock.
+        now = time.time()
+        stale = []
+        for key in list(self._clients):
+            keep = deque()
+            for client, released in self._clients[key]:
+                transport = client.get_transport()
+                expired = (
+                    idle_timeout is not None and now - released > idle_timeout
+                )
+                if expired or transport is None or not transport.active:
+                    stale.append(client)
+                else:
+                    keep.append((client, released))
+            if keep:
+                self._clients[key] = keep
+            else:
+                del self._clients[key]
+        return stale
+
+
+#: The process-wide `.SSHClientPool` consulted by `.Connection` when pooling
+#: is enabled.
+client_pool = SSHClientPool()
+atexit.register(client_pool.clear)
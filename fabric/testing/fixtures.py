@@ -152,17 +152,14 @@ def client():
       ``True``.
     - This includes `.Connection.close`, which short-circuits if
       ``.is_connected``; having a statically ``True`` active flag means a full
-      open -> close cycle will run without error. (Only tests that double-close
-      or double-open should have issues here.)
+      open -> close cycle will run without error.
 
     End result is that:
 
     - ``.is_connected`` behaves False after instantiation and before ``.open``,
-      then True after ``.open``
-    - ``.close`` will work normally on 1st call
-    - ``.close`` will behave "incorrectly" on subsequent calls (since it'll
-      think connection is still live.) Tests that check the idempotency of
-      ``.close`` will need to tweak their mock mid-test.
+      then True after ``.open``, and False again after ``.close``
+    - ``.close`` will work normally on 1st call, and do nothing on subsequent
+      calls.
 
     For 'full' fake remote session interaction (i.e. stdout/err
     reading/writing, channel opens, etc) see `remote`.
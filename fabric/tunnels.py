@@ -6,13 +6,107 @@ see `.Connection`, e.g. `.Connection.forward_local`.
 """
 
 import errno
+import os
 import select
 import socket
-import time
-from threading import Event
+import sys
+from threading import Lock
 
 from invoke.exceptions import ThreadException
-from invoke.util import ExceptionHandlingThread
+from invoke.util import ExceptionHandlingThread, ExceptionWrapper
+
+
+class _Wakeup(object):
+    # Self-pipe letting other threads interrupt a select() call right away.
+    # Selectable itself (via fileno()) when listed in readers(). Unavailable on
+    # Windows, whose select() only handles sockets, in which case readers() is
+    # empty and callers must fall back to polling.
+
+    def __init__(self):
+        self._lock = Lock()
+        self._fds = None
+        if os.name == "posix":
+            import fcntl
+
+            self._fds = os.pipe()
+            # Never block writers, however many wakeups are pending.
+            flags = fcntl.fcntl(self._fds[1], fcntl.F_GETFL)
+            fcntl.fcntl(self._fds[1], fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def fileno(self):
+        return self._fds[0]
+
+    def readers(self):
+        return [self] if self._fds is not None else []
+
+    def set(self):
+        with self._lock:
+            if self._fds is None:
+                return
+            try:
+                os.write(self._fds[1], b"x")
+            except OSError as e:
+                # Pipe full, i.e. plenty of wakeups already pending.
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+
+    def clear(self):
+        os.read(self._fds[0], 4096)
+
+    def close(self):
+        with self._lock:
+            if self._fds is not None:
+                for fd in self._fds:
+                    os.close(fd)
+                self._fds = None
+
+
+def raise_thread_exception(thread):
+    """
+    Raise any error which ended ``thread``, as a `.ThreadException`.
+
+    ``thread`` is a finished `.TunnelManager`, `.Reactor` or similar. Either
+    the inner `.ThreadException` it raised on behalf of the connections it
+    serviced is raised as-is, or whatever else it raised is wrapped in a new
+    one. Does nothing if the thread finished cleanly.
+
+    .. versionadded:: 2.6
+    """
+    wrapper = thread.exception()
+    if wrapper is not None:
+        if wrapper.type is ThreadException:
+            raise wrapper.value
+        raise ThreadException([wrapper])
+
+
+def _service_relays(relays, readers, timeout, poll_interval, wakeup, errors):
+    # One round of the event loop shared by TunnelManager and Reactor: wait
+    # (up to timeout) for any of readers, wakeup or the relays' endpoints to
+    # become ready, then service the relays. Relays which raise are closed,
+    # with their exception appended to errors; closed relays are removed from
+    # relays in place. Returns the list of readable objects.
+    readers = list(readers) + wakeup.readers()
+    writers = []
+    if not wakeup.readers():
+        timeout = poll_interval
+    for relay in relays:
+        readers.extend(relay.readers())
+        writers.extend(relay.writers())
+        if relay.polling():
+            timeout = poll_interval
+    r, w, x = select.select(readers, writers, [], timeout)
+    if wakeup in r:
+        wakeup.clear()
+    # NOTE: every relay gets serviced, not just those which were selected, as
+    # channel writability can't be select()ed on.
+    for relay in relays:
+        try:
+            relay.service(r, w)
+        except Exception:
+            errors.append(ExceptionWrapper({}, *sys.exc_info()))
+            relay.close()
+    relays[:] = [x for x in relays if not x.closed]
+    return r
 
 
 class TunnelManager(ExceptionHandlingThread):
@@ -24,12 +118,34 @@ class TunnelManager(ExceptionHandlingThread):
     tunnel or the other. If you need to forward connections between more than
     one set of ports, you'll end up instantiating multiple TunnelManagers.
 
+    All of those connections are serviced by this one thread: it waits on the
+    listening socket and every open `.Relay` at once, and shuttles data for
+    whichever of them are ready, instead of spawning a thread per connection.
+    (Only opening each connection's SSH channel, which means waiting on the
+    server, happens in a short-lived thread of its own, so as not to hold up
+    data for the others meanwhile.)
+
     Wraps a `~paramiko.transport.Transport`, which should already be connected
     to the remote server.
 
+    Call `stop` to shut down; setting ``finished`` directly also works, but
+    is only noticed every `finished_interval` seconds.
+
     .. versionadded:: 2.0
+    .. versionchanged:: 2.6
+        Service all forwarded connections from this thread, via `.Relay`
+        objects, instead of spawning a `.Tunnel` thread for each.
+    .. versionchanged:: 2.6
+        Added `stop`.
     """
 
+    #: Seconds to wait before retrying writes to channels whose remote window
+    #: was full (and, where `stop` can't wake the thread at once, i.e. on
+    #: Windows, before re-checking the ``finished`` flag.)
+    poll_interval = 0.01
+    #: Seconds to wait for activity before re-checking the ``finished`` flag.
+    finished_interval = 1
+
     def __init__(
         self,
         local_host,
@@ -44,91 +160,417 @@ class TunnelManager(ExceptionHandlingThread):
         self.remote_address = (remote_host, remote_port)
         self.transport = transport
         self.finished = finished
+        # Freelist of relay read buffers, see `.Relay`.
+        self._buffers = []
+        self._wakeup = _Wakeup()
+        # Relays (and errors) from _open_relay threads, not yet picked up by
+        # the main loop; and those threads themselves.
+        self._lock = Lock()
+        self._pending = []
+        self._errors = []
+        self._openers = []
+
+    def stop(self):
+        """
+        Set the ``finished`` flag, waking the thread so it notices at once.
+
+        Does not `join` the thread.
+
+        .. versionadded:: 2.6
+        """
+        self.finished.set()
+        self._wakeup.set()
 
     def _run(self):
         # Track each tunnel that gets opened during our lifetime
-        tunnels = []
+        relays = []
+        exceptions = []
 
         # Set up OS-level listener socket on forwarded port
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         # TODO: why do we want REUSEADDR exactly? and is it portable?
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        # NOTE: choosing to deal with nonblocking semantics and a fast loop,
-        # versus an older approach which blocks & expects outer scope to cause
-        # a socket exception by close()ing the socket.
         sock.setblocking(0)
-        sock.bind(self.local_address)
-        sock.listen(1)
+        try:
+            sock.bind(self.local_address)
+            sock.listen(1)
 
-        while not self.finished.is_set():
-            # Main loop-wait: accept connections on the local listener
-            # NOTE: EAGAIN means "you're nonblocking and nobody happened to
-            # connect at this point in time"
-            try:
-                tun_sock, local_addr = sock.accept()
-                # Set TCP_NODELAY to match OpenSSH's forwarding socket behavior
-                tun_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            except socket.error as e:
-                if e.errno is errno.EAGAIN:
-                    # TODO: make configurable
-                    time.sleep(0.01)
-                    continue
-                raise
-
-            # Set up direct-tcpip channel on server end
-            # TODO: refactor w/ what's used for gateways
+            while not self.finished.is_set():
+                with self._lock:
+                    relays.extend(self._pending)
+                    del self._pending[:]
+                r = _service_relays(
+                    relays,
+                    [sock],
+                    self.finished_interval,
+                    self.poll_interval,
+                    self._wakeup,
+                    exceptions,
+                )
+                if sock in r:
+                    self._accept(sock)
+        finally:
+            # Close any tunnels still open at shutdown time, & our own sock.
+            # TODO: would be nice to have some output or at least logging
+            # here, especially for "sets up a handful of tunnels" use cases
+            # like forwarding nontrivial HTTP traffic.
+            sock.close()
+            # Channels still being opened are waited for (it's only a round
+            # trip), so their relays are closed too and no errors get lost.
+            for thread in self._openers:
+                thread.join()
+            with self._lock:
+                relays.extend(self._pending)
+                del self._pending[:]
+                exceptions.extend(self._errors)
+            for relay in relays:
+                relay.close()
+            self._wakeup.close()
+
+        # Handle exceptions
+        if exceptions:
+            raise ThreadException(exceptions)
+
+    def _accept(self, sock):
+        # NOTE: EAGAIN means "you're nonblocking and somebody else (or nobody,
+        # after a spurious wakeup) got to that connection first"
+        try:
+            tun_sock, local_addr = sock.accept()
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return None
+            raise
+        # Set TCP_NODELAY to match OpenSSH's forwarding socket behavior
+        tun_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Opening the channel means waiting on the server, which mustn't
+        # stall every other relay; so it's done in a short-lived thread, which
+        # hands the resulting relay back to us.
+        self._openers = [x for x in self._openers if x.is_alive()]
+        thread = ExceptionHandlingThread(
+            target=self._open_relay, args=(tun_sock, local_addr)
+        )
+        self._openers.append(thread)
+        thread.start()
+
+    def _open_relay(self, tun_sock, local_addr):
+        # Set up direct-tcpip channel on server end
+        # TODO: refactor w/ what's used for gateways
+        try:
             channel = self.transport.open_channel(
                 "direct-tcpip", self.remote_address, local_addr
             )
+        except Exception:
+            tun_sock.close()
+            with self._lock:
+                self._errors.append(ExceptionWrapper({}, *sys.exc_info()))
+            return
+        relay = Relay(channel=channel, sock=tun_sock, buffers=self._buffers)
+        with self._lock:
+            self._pending.append(relay)
+        self._wakeup.set()
+
+
+class Relay(object):
+    """
+    Non-blocking, bidirectional data relay between an SSH channel and a socket.
+
+    Unlike `.Tunnel`, this is not a thread: its owner (e.g. `.TunnelManager`)
+    waits for any of its `readers` / `writers` to become ready, then calls
+    `service`. At most one chunk per direction is buffered; while a chunk is
+    waiting to be written, its source isn't read from, so a slow reader
+    applies back-pressure to its writer without stalling other relays. (This
+    also means nothing read from an end is left undelivered when it hangs
+    up.)
+
+    Socket data is read straight into a preallocated buffer and handed on as
+    a `memoryview` of it, and partially-written data is re-sent as a view of
+    its remainder, so relaying doesn't copy or allocate per chunk beyond what
+    Paramiko itself does.
+
+    :param release:
+        Optional callable which, if given, is handed the socket instead of it
+        being closed, when it's the channel end which hung up or the relay is
+        closed with ``reusable=True``. As with `.Tunnel`.
+
+    :param list buffers:
+        Optional freelist of read buffers (``bytearray`` objects of
+        ``socket_chunk_size`` bytes) shared between relays. One is taken from
+        it, if available, instead of allocating a new one; and it's returned
+        there when the relay closes.
+
+    .. versionadded:: 2.6
+    """
+
+    #: Size of socket reads, and thus of read buffers.
+    socket_chunk_size = 65536
+    #: Size of channel reads.
+    channel_chunk_size = 65536
+
+    def __init__(self, channel, sock, release=None, buffers=None):
+        self.channel = channel
+        self.sock = sock
+        self.release = release
+        self.buffers = buffers
+        # Our socket end is written to opportunistically, never blocked on.
+        self.sock.setblocking(0)
+        self._buffer = None
+        if buffers:
+            try:
+                self._buffer = buffers.pop()
+            except IndexError:  # Another relay beat us to it
+                pass
+        if self._buffer is None:
+            self._buffer = bytearray(self.socket_chunk_size)
+        #: Whether this relay has shut down (one end hung up, or `close` was
+        #: called.)
+        self.closed = False
+        # Data read from one end that is not yet written to the other.
+        self._to_channel = b""
+        self._to_sock = b""
+
+    def readers(self):
+        """
+        Return the endpoints which should be waited on for reading.
+
+        .. versionadded:: 2.6
+        """
+        readers = []
+        if not self._to_channel:
+            readers.append(self.sock)
+        if not self._to_sock:
+            readers.append(self.channel)
+        return readers
+
+    def writers(self):
+        """
+        Return the endpoints which should be waited on for writing.
+
+        .. versionadded:: 2.6
+        """
+        return [self.sock] if self._to_sock else []
+
+    def polling(self):
+        """
+        Return whether this relay needs servicing even without any activity.
+
+        True while data waits for room in the channel's remote window, which
+        (unlike readability) can't be waited upon via ``select()``.
+
+        .. versionadded:: 2.6
+        """
+        return bool(self._to_channel)
+
+    def service(self, readable, writable):
+        """
+        Move data between ends, given lists of ready endpoints.
+
+        Reads from ends present in ``readable`` and writes pending data to
+        whichever ends can take it. Closes the relay if either end hung up.
+
+        .. versionadded:: 2.6
+        """
+        if self.sock in readable and not self._to_channel:
+            size = self._recv_into(self.sock, self._buffer)
+            if size is not None:
+                if not size:
+                    return self.close()
+                self._to_channel = memoryview(self._buffer)[:size]
+        if self.channel in readable and not self._to_sock:
+            data = self.channel.recv(self.channel_chunk_size)
+            if not data:
+                return self.close(reusable=True)
+            self._to_sock = memoryview(data)
+        # Paramiko would block on send() when the remote window is full, so
+        # only send when it says there's room.
+        if self._to_channel and self.channel.send_ready():
+            sent = self.channel.send(self._to_channel)
+            self._to_channel = self._to_channel[sent:]
+        if self._to_sock:
+            try:
+                sent = self.sock.send(self._to_sock)
+            except socket.error as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+            else:
+                self._to_sock = self._to_sock[sent:]
+
+    def close(self, reusable=False):
+        """
+        Close both ends of the relay.
+
+        :param bool reusable:
+            Whether the socket is still fit for reuse, i.e. whether to hand it
+            to ``release`` (if given) instead of closing it.
+
+        .. versionadded:: 2.6
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.channel.close()
+        if reusable and self.release is not None:
+            self.release(self.sock)
+        else:
+            self.sock.close()
+        # Drop views of the read buffer before handing it to another relay
+        self._to_channel = self._to_sock = b""
+        if self.buffers is not None:
+            self.buffers.append(self._buffer)
+        self._buffer = None
+
+    def _recv_into(self, sock, buf):
+        # Returns None when there turned out to be nothing to read after all.
+        try:
+            return sock.recv_into(buf)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return None
+            raise
+
 
-            # Set up 'worker' thread for this specific connection to our
-            # tunnel, plus its dedicated signal event (which will appear as a
-            # public attr, no need to track both independently).
-            finished = Event()
-            tunnel = Tunnel(channel=channel, sock=tun_sock, finished=finished)
-            tunnel.start()
-            tunnels.append(tunnel)
+class Reactor(ExceptionHandlingThread):
+    """
+    Thread servicing any number of `.Relay` objects, added at any time.
+
+    Used by `.Connection.forward_remote`, where connections arrive via
+    Paramiko's own transport thread (and are thus handed to us via `add`),
+    so that forwarding any number of connections costs a single thread.
+
+    Call `stop` to close all relays and end the thread; any exceptions which
+    occurred while servicing relays are then raised as a
+    `~invoke.exceptions.ThreadException`, as with `.TunnelManager`.
+
+    .. versionadded:: 2.6
+    """
+
+    #: Seconds to wait before retrying writes to channels whose remote window
+    #: was full (and, where self-pipe wakeups aren't available, before checking
+    #: for new relays or being stopped.)
+    poll_interval = 0.01
+
+    def __init__(self):
+        super(Reactor, self).__init__()
+        #: Freelist of read buffers to hand to `.Relay` objects added to this
+        #: reactor, so a burst of connections only allocates buffers once.
+        self.buffers = []
+        self._lock = Lock()
+        self._pending = []
+        self._stopping = False
+        # Set whenever the thread should look at _pending or _stopping right
+        # away.
+        self._wakeup = _Wakeup()
+
+    def add(self, relay):
+        """
+        Begin servicing ``relay``.
+
+        .. versionadded:: 2.6
+        """
+        with self._lock:
+            if not self._stopping:
+                self._pending.append(relay)
+                self._wakeup.set()
+                return
+        # Too late; nobody would ever service (or close) it.
+        relay.close(reusable=True)
+
+    def stop(self):
+        """
+        Ask the thread to close all relays and exit. Does not `join` it.
+
+        .. versionadded:: 2.6
+        """
+        with self._lock:
+            if not self._stopping:
+                self._stopping = True
+                self._wakeup.set()
 
+    def _run(self):
+        relays = []
         exceptions = []
-        # Propogate shutdown signal to all tunnels & wait for closure
-        # TODO: would be nice to have some output or at least logging here,
-        # especially for "sets up a handful of tunnels" use cases like
-        # forwarding nontrivial HTTP traffic.
-        for tunnel in tunnels:
-            tunnel.finished.set()
-            tunnel.join()
-            wrapper = tunnel.exception()
-            if wrapper:
-                exceptions.append(wrapper)
-        # Handle exceptions
+        try:
+            while True:
+                with self._lock:
+                    relays.extend(self._pending)
+                    del self._pending[:]
+                    if self._stopping:
+                        break
+                _service_relays(
+                    relays,
+                    [],
+                    None,
+                    self.poll_interval,
+                    self._wakeup,
+                    exceptions,
+                )
+        finally:
+            with self._lock:
+                self._stopping = True
+                relays.extend(self._pending)
+                del self._pending[:]
+            for relay in relays:
+                relay.close(reusable=True)
+            self._wakeup.close()
         if exceptions:
             raise ThreadException(exceptions)
 
-        # All we have left to close is our own sock.
-        # TODO: use try/finally?
-        sock.close()
-
 
 class Tunnel(ExceptionHandlingThread):
     """
     Bidirectionally forward data between an SSH channel and local socket.
 
+    :param release:
+        Optional callable which, if given, is handed the local socket at
+        shutdown instead of it being closed, provided the socket is still
+        healthy (i.e. it's the channel end which hung up, or the tunnel was
+        told to finish, and no errors occurred.) Used to reuse local sockets
+        across tunnels.
+
+    Call `stop` to shut down; as with `.TunnelManager`, setting ``finished``
+    directly also works, but is only noticed once a second.
+
     .. versionadded:: 2.0
+    .. versionchanged:: 2.6
+        Added the ``release`` argument.
+    .. versionchanged:: 2.6
+        Added `stop`.
     """
 
-    def __init__(self, channel, sock, finished):
+    def __init__(self, channel, sock, finished, release=None):
         self.channel = channel
         self.sock = sock
         self.finished = finished
+        self.release = release
         self.socket_chunk_size = 1024
         self.channel_chunk_size = 1024
+        # Created by _run, so unstarted tunnels hold no pipe.
+        self._wakeup = None
         super(Tunnel, self).__init__()
 
+    def stop(self):
+        """
+        Set the ``finished`` flag, waking the thread so it notices at once.
+
+        Does not `join` the thread.
+
+        .. versionadded:: 2.6
+        """
+        self.finished.set()
+        # If not running yet, _run notices finished before ever selecting.
+        wakeup = self._wakeup
+        if wakeup is not None:
+            wakeup.set()
+
     def _run(self):
+        reusable = False
+        self._wakeup = _Wakeup()
         try:
             empty_sock, empty_chan = None, None
             while not self.finished.is_set():
-                r, w, x = select.select([self.sock, self.channel], [], [], 1)
+                readers = [self.sock, self.channel] + self._wakeup.readers()
+                r, w, x = select.select(readers, [], [], 1)
+                if self._wakeup in r:
+                    self._wakeup.clear()
                 if self.sock in r:
                     empty_sock = self.read_and_write(
                         self.sock, self.channel, self.socket_chunk_size
@@ -139,9 +581,14 @@ class Tunnel(ExceptionHandlingThread):
                     )
                 if empty_sock or empty_chan:
                     break
+            reusable = not empty_sock
         finally:
+            self._wakeup.close()
             self.channel.close()
-            self.sock.close()
+            if reusable and self.release is not None:
+                self.release(self.sock)
+            else:
+                self.sock.close()
 
     def read_and_write(self, reader, writer, chunk_size):
         """
@@ -71,3 +71,19 @@ def faux_v1_env():
         user="localuser",
         warn_only=False,
     )
+
+
+def recv_into(data):
+    """
+    Return a function suitable for mocking a socket's ``recv_into()``.
+
+    It fills the given buffer with (the start of) ``data`` each time it's
+    called, returning the number of bytes written.
+    """
+
+    def recv_into(buf):
+        size = min(len(buf), len(data))
+        buf[:size] = data[:size]
+        return size
+
+    return recv_into
@@ -1,10 +1,18 @@
+try:
+    from invoke.vendor.six import StringIO
+except ImportError:
+    from six import StringIO
 import errno
+import os
 from os.path import join, expanduser
+import shutil
+import tempfile
 
 from paramiko.config import SSHConfig
 from invoke.vendor.lexicon import Lexicon
 
 from fabric import Config
+from fabric.config import CachedSSHConfig, _ssh_file_cache, _shared_lookups
 from fabric.util import get_local_user
 
 from mock import patch, call
@@ -198,7 +206,7 @@ class ssh_config_loading:
         # one of these is 'empty' or not. So for now, expect an empty inner
         # SSHConfig._config from an un-.parse()d such object. (AFAIK, such
         # objects work fine re: .lookup, .get_hostnames etc.)
-        assert type(c.base_ssh_config) is SSHConfig
+        assert type(c.base_ssh_config) is CachedSSHConfig
         assert c.base_ssh_config._config == []
 
     def object_can_be_given_explicitly_via_ssh_config_kwarg(self):
@@ -306,6 +314,112 @@ class ssh_config_loading:
             # it did not load any other files)
             method.assert_called_once_with(self._runtime_path)
 
+    class lookup_caching:
+        def setup(self):
+            _shared_lookups.clear()
+
+        def teardown(self):
+            _shared_lookups.clear()
+
+        def _config(self):
+            return Config(runtime_ssh_path=self._runtime_path)
+
+        def repeat_lookups_do_not_rescan_rules(self):
+            c = self._config()
+            with patch.object(SSHConfig, "lookup") as lookup:
+                lookup.return_value = {"hostname": "runtime"}
+                c.base_ssh_config.lookup("runtime")
+                c.base_ssh_config.lookup("runtime")
+            lookup.assert_called_once_with("runtime")
+
+        def results_are_copies(self):
+            sc = self._config().base_ssh_config
+            sc.lookup("runtime")["identityfile"].append("mutated.key")
+            assert "mutated.key" not in sc.lookup("runtime")["identityfile"]
+
+        def parsing_new_data_clears_cache(self):
+            sc = self._config().base_ssh_config
+            assert "port" not in sc.lookup("shared")
+            with open(self._system_path) as fd:
+                sc.parse(fd)
+            assert sc.lookup("shared")["port"] == "123"
+
+        def cloned_configs_cache_independently(self):
+            c = self._config()
+            c.base_ssh_config.lookup("runtime")
+            clone = c.clone()
+            assert isinstance(clone.base_ssh_config, CachedSSHConfig)
+            assert clone.base_ssh_config._lookups == {}
+
+        def configs_loading_the_same_files_share_lookups(self):
+            one, two = self._config(), self._config()
+            with patch.object(SSHConfig, "lookup") as lookup:
+                lookup.return_value = {"hostname": "runtime"}
+                one.base_ssh_config.lookup("runtime")
+                two.base_ssh_config.lookup("runtime")
+                one.clone().base_ssh_config.lookup("runtime")
+            lookup.assert_called_once_with("runtime")
+
+        def match_exec_rules_disable_caching(self):
+            # Their outcome may change from one lookup to the next
+            sc = CachedSSHConfig()
+            sc.parse(StringIO('Match exec "test -e flag"\n    Port 2222\n'))
+            with patch.object(SSHConfig, "lookup") as lookup:
+                lookup.return_value = {"hostname": "host"}
+                sc.lookup("host")
+                sc.lookup("host")
+            assert lookup.call_count == 2
+            assert _shared_lookups == {}
+
+        def configs_with_different_rules_do_not_share_lookups(self):
+            one = self._config()
+            two = Config(lazy=True)
+            two._load_ssh_file(self._system_path)
+            assert one.base_ssh_config.lookup("shared") != (
+                two.base_ssh_config.lookup("shared")
+            )
+
+    class file_parse_caching:
+        def setup(self):
+            _ssh_file_cache.clear()
+
+        def teardown(self):
+            _ssh_file_cache.clear()
+
+        def unchanged_files_are_parsed_once_per_process(self):
+            with patch.object(
+                SSHConfig, "parse", autospec=True, side_effect=SSHConfig.parse
+            ) as parse:
+                one = Config(runtime_ssh_path=self._runtime_path)
+                two = Config(runtime_ssh_path=self._runtime_path)
+            assert parse.call_count == 1
+            assert one.base_ssh_config.lookup("runtime") == (
+                two.base_ssh_config.lookup("runtime")
+            )
+
+        def modified_files_are_parsed_again(self):
+            tmpdir = tempfile.mkdtemp()
+            try:
+                path = join(tmpdir, "ssh_config")
+                shutil.copy(self._runtime_path, path)
+                c = Config(runtime_ssh_path=path)
+                assert c.base_ssh_config.lookup("runtime")["port"] == "666"
+                with open(path, "a") as fd:
+                    fd.write("\nHost newhost\n    Port 1234\n")
+                # Ensure mtime differs even on coarse-grained filesystems
+                stat = os.stat(path)
+                os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+                c = Config(runtime_ssh_path=path)
+                assert c.base_ssh_config.lookup("newhost")["port"] == "1234"
+            finally:
+                shutil.rmtree(tmpdir)
+
+        def loading_clears_lookup_cache(self):
+            c = Config(lazy=True)
+            assert "port" not in c.base_ssh_config.lookup("shared")
+            c._load_ssh_file(self._system_path)
+            assert c.base_ssh_config.lookup("shared")["port"] == "123"
+
     class lazy_loading_and_explicit_methods:
         @patch.object(Config, "_load_ssh_file")
         def may_use_lazy_plus_explicit_methods_to_control_flow(self, method):
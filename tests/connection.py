@@ -1,11 +1,11 @@
 from itertools import chain, repeat
 
 try:
-    from invoke.vendor.six import b
+    from invoke.vendor.six import b, StringIO
 except ImportError:
-    from six import b
+    from six import b, StringIO
 import errno
-from os.path import join
+from os.path import expanduser, join
 import socket
 import time
 
@@ -22,9 +22,10 @@ from invoke.exceptions import ThreadException
 
 from fabric import Config, Connection
 from fabric.exceptions import InvalidV1Env
+from fabric.pool import SSHClientPool
 from fabric.util import get_local_user
 
-from _util import support, faux_v1_env
+from _util import support, faux_v1_env, recv_into
 
 
 # Remote is woven in as a config default, so must be patched there
@@ -52,6 +53,26 @@ def _select_result(obj):
     return chain([initial], repeat([tuple(), tuple(), tuple()]))
 
 
+def _select_when_waited_on(*objs):
+    """
+    Return a function suitable for mocking a select.select() call.
+
+    Unlike `_select_result`, each of ``objs`` is reported readable (once) only
+    when actually among the readers passed in; useful when the thing selecting
+    may begin doing so before ``objs`` are handed to it. Everything waited on
+    for writing is always reported writable.
+    """
+    pending = list(objs)
+
+    def select(readers, writers, errors, timeout=None):
+        ready = tuple(x for x in pending if x in readers)
+        for x in ready:
+            pending.remove(x)
+        return ready, tuple(writers), tuple()
+
+    return select
+
+
 class Connection_:
     class basic_attributes:
         def is_connected_defaults_to_False(self):
@@ -62,6 +83,20 @@ class Connection_:
             assert isinstance(c, SSHClient)
             assert c.get_transport() is None
 
+        def real_attributes_are_set_on_the_instance(self):
+            c = Connection("host")
+            c.host = "otherhost"
+            c._sftp = "sentinel"
+            assert c.host == "otherhost"
+            assert c.__dict__["_sftp"] == "sentinel"
+            assert "host" not in c.config
+
+        def other_attributes_are_set_as_config_keys(self):
+            c = Connection("host")
+            c.whatever = "value"
+            assert c.config.whatever == "value"
+            assert "whatever" not in c.__dict__
+
     class known_hosts_behavior:
         def defaults_to_auto_add(self):
             # TODO: change Paramiko API so this isn't a private access
@@ -95,6 +130,18 @@ class Connection_:
                 assert c.user == "user"
                 assert c.port == 123
 
+            def user_shorthand_ends_at_last_at_sign(self):
+                c = Connection("user@example.com@host:123")
+                assert c.user == "user@example.com"
+                assert c.host == "host"
+                assert c.port == 123
+
+            def empty_shorthand_segments_are_ignored(self):
+                c = Connection("@host:")
+                assert c.host == "host"
+                assert c.user == get_local_user()
+                assert c.port == 22
+
             def ipv6_addresses_work_ok_but_avoid_port_shorthand(self):
                 for addr in ("2001:DB8:0:0:0:0:0:1", "2001:DB8::1", "::1"):
                     c = Connection(addr, port=123)
@@ -143,6 +190,11 @@ class Connection_:
             def may_be_given_as_kwarg(self):
                 assert Connection("host", port=2202).port == 2202
 
+            def is_coerced_to_int(self):
+                assert Connection("host", port="2202").port == 2202
+                config = Config(overrides={"port": "2222"})
+                assert Connection("host", config=config).port == 2222
+
             @raises(ValueError)
             def errors_when_given_as_both_kwarg_and_shorthand(self):
                 Connection("host:123", port=321)
@@ -218,6 +270,27 @@ class Connection_:
                 cxn = Connection("host", config=vanilla)
                 assert cxn.forward_agent is True  # not False, which is default
 
+            def upgraded_invoke_Config_is_reused_while_unchanged(self):
+                vanilla = InvokeConfig(overrides={"forward_agent": True})
+                with patch.object(
+                    vanilla, "clone", wraps=vanilla.clone
+                ) as clone:
+                    one = Connection("host", config=vanilla)
+                    two = Connection("otherhost", config=vanilla)
+                    assert clone.call_count == 1
+                    assert one.config is two.config
+                    # Modifying the original yields a fresh upgrade
+                    vanilla.forward_agent = False
+                    three = Connection("host", config=vanilla)
+                    assert clone.call_count == 2
+                assert three.config is not one.config
+                assert three.forward_agent is False
+
+            def distinct_invoke_Configs_are_upgraded_separately(self):
+                one = Connection("host", config=InvokeConfig())
+                two = Connection("host", config=InvokeConfig())
+                assert one.config is not two.config
+
         class gateway:
             def is_optional_and_defaults_to_None(self):
                 c = Connection(host="host")
@@ -243,7 +316,18 @@ class Connection_:
         class initializes_client:
             @patch("fabric.connection.SSHClient")
             def instantiates_empty_SSHClient(self, Client):
+                Connection("host").client
+                Client.assert_called_once_with()
+
+            @patch("fabric.connection.SSHClient")
+            def does_not_instantiate_SSHClient_until_needed(self, Client):
                 Connection("host")
+                assert not Client.called
+
+            @patch("fabric.connection.SSHClient")
+            def only_instantiates_SSHClient_once(self, Client):
+                cxn = Connection("host")
+                assert cxn.client is cxn.client
                 Client.assert_called_once_with()
 
             @patch("fabric.connection.Connection.default_host_key_policy")
@@ -251,7 +335,7 @@ class Connection_:
                 # TODO: should make the policy configurable early on
                 sentinel = Mock()
                 Policy.return_value = sentinel
-                Connection("host")
+                Connection("host").client
                 set_policy = client.set_missing_host_key_policy
                 set_policy.assert_called_once_with(sentinel)
 
@@ -586,6 +670,123 @@ class Connection_:
                     cxn = self._cxn(host_string="localghost:3737", port=2222)
                     assert cxn.port == 3737
 
+    class from_hosts:
+        def returns_one_Connection_per_host_in_order(self):
+            cxns = Connection.from_hosts(["host1", "user@host2", "host3:2222"])
+            assert [x.host for x in cxns] == ["host1", "host2", "host3"]
+            assert cxns[1].user == "user"
+            assert cxns[2].port == 2222
+
+        def accepts_any_iterable(self):
+            cxns = Connection.from_hosts(x for x in ("host1", "host2"))
+            assert len(cxns) == 2
+
+        def all_connections_share_one_new_Config_by_default(self):
+            one, two = Connection.from_hosts(["host1", "host2"])
+            assert isinstance(one.config, Config)
+            assert one.config is two.config
+
+        def given_Config_is_shared(self):
+            config = Config(overrides={"user": "me"})
+            cxns = Connection.from_hosts(["host1", "host2"], config=config)
+            assert all(x.config is config for x in cxns)
+            assert all(x.user == "me" for x in cxns)
+
+        def vanilla_Invoke_config_is_upgraded_only_once(self):
+            vanilla = InvokeConfig(overrides={"forward_agent": True})
+            one, two = Connection.from_hosts(
+                ["host1", "host2"], config=vanilla
+            )
+            assert isinstance(one.config, Config)
+            assert one.config is two.config
+            assert one.forward_agent is True
+
+        def other_kwargs_passed_to_every_Connection(self):
+            cxns = Connection.from_hosts(["host1", "host2"], port=2222)
+            assert all(x.port == 2222 for x in cxns)
+
+        class identity_files_do_not_leak_between_hosts:
+            _ssh_config = """
+Host h1
+    IdentityFile key1
+
+Host h2
+    IdentityFile key2
+"""
+
+            def _assert_own_keys(self, cxns, base=()):
+                base = list(base)
+                one, two = cxns
+                assert one.connect_kwargs["key_filename"] == base + ["key1"]
+                assert two.connect_kwargs["key_filename"] == base + ["key2"]
+
+            def with_shared_Config(self):
+                ssh_config = SSHConfig()
+                ssh_config.parse(StringIO(self._ssh_config))
+                config = Config(
+                    ssh_config=ssh_config,
+                    overrides={"connect_kwargs": {"key_filename": ["base"]}},
+                )
+                cxns = Connection.from_hosts(["h1", "h2"], config=config)
+                self._assert_own_keys(cxns, base=["base"])
+                assert config.connect_kwargs.key_filename == ["base"]
+
+            def with_shared_vanilla_Invoke_config(self):
+                vanilla = InvokeConfig()
+                # Load our SSH config into the (reused) converted Config
+                converted = Connection("h1", config=vanilla).config
+                converted.base_ssh_config.parse(StringIO(self._ssh_config))
+                for _ in range(2):
+                    cxns = Connection.from_hosts(["h1", "h2"], config=vanilla)
+                    assert cxns[0].config is converted
+                    self._assert_own_keys(cxns)
+                assert "key_filename" not in converted.connect_kwargs
+
+            def with_shared_connect_kwargs(self):
+                ssh_config = SSHConfig()
+                ssh_config.parse(StringIO(self._ssh_config))
+                config = Config(ssh_config=ssh_config)
+                connect_kwargs = {"key_filename": ["given"]}
+                cxns = Connection.from_hosts(
+                    ["h1", "h2"], config=config, connect_kwargs=connect_kwargs
+                )
+                self._assert_own_keys(cxns, base=["given"])
+                assert connect_kwargs == {"key_filename": ["given"]}
+
+    class derive_shorthand:
+        def returns_dict_of_user_host_and_port(self):
+            expected = {"user": "me", "host": "host", "port": 2222}
+            assert Connection("x").derive_shorthand("me@host:2222") == expected
+
+        def missing_parts_are_None(self):
+            expected = {"user": None, "host": "host", "port": None}
+            assert Connection("x").derive_shorthand("host") == expected
+
+        class may_be_overridden_by_subclasses:
+            def _subclass(self):
+                class AliasingConnection(Connection):
+                    def derive_shorthand(self, host_string):
+                        if host_string == "alias":
+                            host_string = "me@realhost:2222"
+                        return super(
+                            AliasingConnection, self
+                        ).derive_shorthand(host_string)
+
+                return AliasingConnection
+
+            def used_when_parsing_host_argument(self):
+                cxn = self._subclass()("alias")
+                assert cxn.user == "me"
+                assert cxn.host == "realhost"
+                assert cxn.port == 2222
+
+            def used_when_checking_for_self_proxying(self):
+                ssh_config = SSHConfig()
+                ssh_config.parse(StringIO("Host *\n    ProxyJump alias\n"))
+                config = Config(ssh_config=ssh_config)
+                cxn = self._subclass()("realhost", config=config)
+                assert cxn.gateway is None
+
     class string_representation:
         "string representations"
 
@@ -639,6 +840,17 @@ class Connection_:
         def hashing_works(self):
             assert hash(Connection("host")) == hash(Connection("host"))
 
+        def hash_and_comparison_track_attribute_changes(self):
+            c = Connection("host")
+            hash(c)  # prime any caching
+            c.user = "someoneelse"
+            other = Connection("host", user="someoneelse")
+            assert c == other
+            assert hash(c) == hash(other)
+            c.port = 2222
+            assert c != other
+            assert hash(c) == hash(Connection("host:2222", user="someoneelse"))
+
         def sorting_works(self):
             # Hostname...
             assert Connection("a-host") < Connection("b-host")
@@ -735,6 +947,69 @@ class Connection_:
                 username="myuser", hostname="myhost", port=9001
             )
 
+        def sets_TCP_NODELAY_on_transport_socket(self, client):
+            for family in (socket.AF_INET, socket.AF_INET6):
+                sock = Mock(spec=socket.socket, family=family)
+                client.get_transport.return_value.sock = sock
+                Connection("host").open()
+                sock.setsockopt.assert_called_once_with(
+                    socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+                )
+
+        def TCP_NODELAY_may_be_disabled_via_config(self, client):
+            sock = Mock(spec=socket.socket, family=socket.AF_INET)
+            client.get_transport.return_value.sock = sock
+            config = Config(overrides={"transport": {"tcp_nodelay": False}})
+            Connection("host", config=config).open()
+            assert not sock.setsockopt.called
+
+        def TCP_NODELAY_skipped_for_non_socket_transports(self, client):
+            # E.g. ProxyCommand or gateway Channel objects
+            # (which lack setsockopt; the spec makes any attempt blow up)
+            sock = Mock(spec=["send", "recv", "close"])
+            client.get_transport.return_value.sock = sock
+            Connection("host").open()
+
+        @pytest.mark.skipif(
+            not hasattr(socket, "AF_UNIX"), reason="Unix sockets only"
+        )
+        def TCP_NODELAY_skipped_for_unix_sockets(self, client):
+            # E.g. a socket given via connect_kwargs; setting TCP options on
+            # it would fail with EOPNOTSUPP.
+            sock, other = socket.socketpair(socket.AF_UNIX)
+            try:
+                client.get_transport.return_value.sock = sock
+                cxn = Connection("host", connect_kwargs={"sock": sock})
+                cxn.open()
+                assert cxn.is_connected
+            finally:
+                sock.close()
+                other.close()
+
+        def sets_transport_keepalive(self, client):
+            Connection("host").open()
+            transport = client.get_transport.return_value
+            transport.set_keepalive.assert_called_once_with(30)
+
+        def keepalive_interval_may_be_configured(self, client):
+            config = Config(overrides={"transport": {"keepalive": 5}})
+            Connection("host", config=config).open()
+            transport = client.get_transport.return_value
+            transport.set_keepalive.assert_called_once_with(5)
+
+        def keepalive_may_be_disabled_via_config(self, client):
+            config = Config(overrides={"transport": {"keepalive": 0}})
+            Connection("host", config=config).open()
+            transport = client.get_transport.return_value
+            assert not transport.set_keepalive.called
+
+        def keepalive_honors_ssh_config_ServerAliveInterval(self, client):
+            sc = SSHConfig()
+            sc.parse(["Host host", "    ServerAliveInterval 10"])
+            Connection("host", config=Config(ssh_config=sc)).open()
+            transport = client.get_transport.return_value
+            transport.set_keepalive.assert_called_once_with(10)
+
         # NOTE: does more involved stuff so can't use "client" fixture
         @patch("fabric.connection.SSHClient")
         def uses_gateway_channel_as_sock_for_SSHClient_connect(self, Client):
@@ -770,6 +1045,109 @@ class Connection_:
             sock_arg = client.connect.call_args[1]["sock"]
             assert sock_arg is moxy.return_value
 
+        @patch("fabric.connection.ProxyCommand")
+        def proxycommand_tokens_use_connection_values(self, moxy, client):
+            main = Connection(
+                "user@host:2222", gateway="nc %r@%h:%p -- 100%% %%h"
+            )
+            main.open()
+            moxy.assert_called_once_with("nc user@host:2222 -- 100% %h")
+
+        @patch("fabric.connection.ProxyCommand")
+        def proxycommand_tilde_expands_to_home(self, moxy, client):
+            Connection("host", gateway="~/bin/hop %h").open()
+            home = expanduser("~")
+            moxy.assert_called_once_with("{}/bin/hop host".format(home))
+
+        class translate_ssh_proxycommand:
+            def _open(self, command, translate=True):
+                config = Config(
+                    overrides={"translate_ssh_proxycommand": translate}
+                )
+                main = Connection("host", gateway=command, config=config)
+                main.open()
+                return main
+
+            @patch("fabric.connection.ProxyCommand")
+            @patch("fabric.connection.SSHClient")
+            def connects_to_ssh_W_hops_in_process(self, Client, moxy):
+                mock_hop, mock_main = Mock(), Mock()
+                Client.side_effect = [mock_hop, mock_main]
+                self._open("ssh -q -W %h:%p jumper@bastion -p 2200")
+                assert not moxy.called
+                kwargs = mock_hop.connect.call_args[1]
+                assert kwargs["hostname"] == "bastion"
+                assert kwargs["username"] == "jumper"
+                assert kwargs["port"] == 2200
+                open_channel = mock_hop.get_transport.return_value.open_channel
+                assert open_channel.call_args[1]["dest_addr"] == ("host", 22)
+                sock = mock_main.connect.call_args[1]["sock"]
+                assert sock is open_channel.return_value
+
+            @patch("fabric.connection.ProxyCommand")
+            def is_off_by_default(self, moxy, client):
+                self._open("ssh -W %h:%p bastion", translate=False)
+                moxy.assert_called_once_with("ssh -W host:22 bastion")
+
+            @patch("fabric.connection.ProxyCommand")
+            def other_commands_still_run_as_subprocess(self, moxy, client):
+                for command in (
+                    "nc bastion %p",
+                    "ssh -i key -W %h:%p bastion",
+                    "ssh -W otherhost:22 bastion",
+                    "ssh -W %h:%p bastion extra",
+                    "ssh -W %h:%p host",
+                ):
+                    moxy.reset_mock()
+                    self._open(command)
+                    assert moxy.call_count == 1
+
+            @patch("fabric.connection.SSHClient")
+            def hop_is_closed_along_with_main_connection(self, Client):
+                mock_hop, mock_main = Mock(), Mock()
+                Client.side_effect = [mock_hop, mock_main]
+                main = self._open("ssh -W %h:%p bastion")
+                main.close()
+                mock_main.close.assert_called_once_with()
+                mock_hop.close.assert_called_once_with()
+                assert main._jump_gateway is None
+
+            @patch("fabric.connection.SSHClient")
+            def hop_is_closed_when_connecting_through_it_fails(self, Client):
+                mock_hop, mock_main = Mock(), Mock()
+                Client.side_effect = [mock_hop, mock_main]
+                mock_main.connect.side_effect = socket.error("nope")
+                config = Config(overrides={"translate_ssh_proxycommand": True})
+                main = Connection(
+                    "host", gateway="ssh -W %h:%p bastion", config=config
+                )
+                with pytest.raises(socket.error):
+                    main.open()
+                mock_hop.close.assert_called_once_with()
+                assert main._jump_gateway is None
+
+            @patch("fabric.connection.SSHClient")
+            def previous_hop_is_closed_when_reopening(self, Client):
+                first_hop, mock_main, second_hop = Mock(), Mock(), Mock()
+                Client.side_effect = [first_hop, mock_main, second_hop]
+                main = self._open("ssh -W %h:%p bastion")
+                # Remote end hung up on us
+                mock_main.get_transport.return_value.active = False
+                main.open()
+                first_hop.close.assert_called_once_with()
+                assert not second_hop.close.called
+                assert main._jump_gateway.client is second_hop
+
+            @patch("fabric.connection.SSHClient")
+            def hop_is_closed_even_if_main_connection_is_not(self, Client):
+                mock_hop, mock_main = Mock(), Mock()
+                Client.side_effect = [mock_hop, mock_main]
+                main = self._open("ssh -W %h:%p bastion")
+                mock_main.get_transport.return_value.active = False
+                main.close()
+                mock_hop.close.assert_called_once_with()
+                assert main._jump_gateway is None
+
         # TODO: all the various connect-time options such as agent forwarding,
         # host acceptance policies, how to auth, etc etc. These are all aspects
         # of a given session and not necessarily the same for entire lifetime
@@ -911,6 +1289,79 @@ class Connection_:
                 c.open()
             client.close.assert_called_once_with()
 
+        def is_connected_False_afterwards(self, client):
+            c = Connection("host")
+            c.open()
+            c.close()
+            assert c.is_connected is False
+
+        def is_idempotent(self, client):
+            c = Connection("host")
+            c.open()
+            c.close()
+            c.close()
+            client.close.assert_called_once_with()
+
+    class pooling:
+        def _config(self):
+            return Config(overrides={"pool": {"enabled": True}})
+
+        @patch("fabric.connection.client_pool")
+        def disabled_by_default(self, pool, client):
+            c = Connection("host")
+            c.open()
+            c.close()
+            assert not pool.acquire.called
+            assert not pool.release.called
+            client.close.assert_called_once_with()
+
+        @patch("fabric.connection.client_pool", new_callable=SSHClientPool)
+        def close_releases_client_to_pool(self, pool, client):
+            c = Connection("host", config=self._config())
+            c.open()
+            c.close()
+            assert not client.close.called
+            assert len(pool) == 1
+            assert c.transport is None
+
+        @patch("fabric.connection.client_pool", new_callable=SSHClientPool)
+        def open_reuses_pooled_client(self, pool, client):
+            config = self._config()
+            first = Connection("host", config=config)
+            first.open()
+            first.close()
+            second = Connection("host", config=config)
+            second.open()
+            assert client.connect.call_count == 1
+            assert second.client is client
+            assert second.is_connected
+
+        @patch("fabric.connection.client_pool", new_callable=SSHClientPool)
+        def pooled_clients_not_shared_across_targets(self, pool, client):
+            config = self._config()
+            first = Connection("host", config=config)
+            first.open()
+            first.close()
+            for kwargs in (
+                dict(host="otherhost"),
+                dict(host="host", user="otheruser"),
+                dict(host="host", port=2222),
+                dict(host="host", connect_kwargs={"password": "sekrit"}),
+            ):
+                Connection(config=config, **kwargs).open()
+            assert client.connect.call_count == 5
+
+        @patch("fabric.connection.client_pool")
+        def close_passes_max_idle_to_pool(self, pool, client):
+            config = Config(
+                overrides={"pool": {"enabled": True, "max_idle": 3}}
+            )
+            pool.acquire.return_value = None
+            c = Connection("host", config=config)
+            c.open()
+            c.close()
+            assert pool.release.call_args[1]["max_idle"] == 3
+
     class create_session:
         def calls_open_for_you(self, client):
             c = Connection("host")
@@ -927,6 +1378,41 @@ class Connection_:
             chan = c.create_session()
             Handler.assert_called_once_with(chan)
 
+        @patch("fabric.connection.AgentRequestHandler")
+        def agent_handlers_kept_while_their_session_is_open(
+            self, Handler, client
+        ):
+            handlers = [Mock(), Mock(), Mock()]
+            Handler.side_effect = handlers
+            transport = client.get_transport.return_value
+            transport.open_session.side_effect = lambda: Mock(closed=False)
+            c = Connection("host", forward_agent=True)
+            first = c.create_session()
+            c.create_session()
+            assert not handlers[0].close.called
+            # Finished sessions' handlers get closed as new ones arrive
+            first.closed = True
+            c.create_session()
+            handlers[0].close.assert_called_once_with()
+            assert not handlers[1].close.called
+            assert len(c._agent_handlers) == 2
+            # And everything else at close()
+            c.close()
+            for handler in handlers:
+                handler.close.assert_called_once_with()
+
+        @patch("fabric.connection.AgentRequestHandler")
+        def reopened_connections_get_a_new_agent_handler(
+            self, Handler, client
+        ):
+            c = Connection("host", forward_agent=True)
+            c.create_session()
+            c.close()
+            c.open()
+            c.create_session()
+            assert Handler.call_count == 2
+            Handler.return_value.close.assert_called_once_with()
+
     class run:
         # NOTE: most actual run related tests live in the runners module's
         # tests. Here we are just testing the outer interface a bit.
@@ -966,6 +1452,60 @@ class Connection_:
             for r in (r1, r2):
                 assert r is sentinel
 
+    class run_many:
+        @patch(remote_path)
+        def runs_each_command_and_returns_results_in_order(
+            self, Remote, client
+        ):
+            Remote.return_value.run.side_effect = lambda cmd, **kw: cmd[::-1]
+            c = Connection("host")
+            commands = ["one", "two", "three", "four"]
+            results = c.run_many(commands, workers=2, hide=True)
+            assert results == ["eno", "owt", "eerht", "ruof"]
+            for command in commands:
+                Remote.return_value.run.assert_any_call(command, hide=True)
+
+        @patch(remote_path)
+        def opens_connection_once_up_front(self, Remote, client):
+            c = Connection("host")
+            c.run_many(["one", "two", "three"])
+            assert client.connect.call_count == 1
+
+        @patch(remote_path)
+        def raises_first_exception_after_all_commands_ran(
+            self, Remote, client
+        ):
+            class OhNoz(Exception):
+                pass
+
+            errors = {"two": OhNoz("two"), "three": OhNoz("three")}
+
+            def run(command, **kwargs):
+                if command in errors:
+                    raise errors[command]
+                return command
+
+            Remote.return_value.run.side_effect = run
+            c = Connection("host")
+            with pytest.raises(OhNoz) as info:
+                c.run_many(["one", "two", "three", "four"])
+            assert info.value is errors["two"]
+            assert Remote.return_value.run.call_count == 4
+
+        @patch(remote_path)
+        def empty_command_list_yields_empty_list(self, Remote, client):
+            assert Connection("host").run_many([]) == []
+            assert not Remote.return_value.run.called
+
+        @patch(remote_path)
+        def workers_below_one_rejected_up_front(self, Remote, client):
+            c = Connection("host")
+            for workers in (0, -1):
+                with pytest.raises(ValueError):
+                    c.run_many(["one", "two"], workers=workers)
+            assert not client.connect.called
+            assert not Remote.return_value.run.called
+
     class local:
         # NOTE: most tests for this functionality live in Invoke's runner
         # tests.
@@ -1074,16 +1614,22 @@ class Connection_:
             # to reconcile the mock decorators + optional-value kwargs. meh.
             tunnel_exception = kwargs.pop("tunnel_exception", None)
             listener_exception = kwargs.pop("listener_exception", False)
+            channel_exception = kwargs.pop("channel_exception", None)
             # Mock setup
             client = Client.return_value
             listener_sock = Mock(name="listener_sock")
             if listener_exception:
                 listener_sock.bind.side_effect = listener_exception
             data = b("Some data")
-            tunnel_sock = Mock(name="tunnel_sock", recv=lambda n: data)
+            tunnel_sock = Mock(name="tunnel_sock", recv_into=recv_into(data))
+            if tunnel_exception:
+                tunnel_sock.recv_into = Mock(side_effect=tunnel_exception)
             local_addr = Mock()
             transport = client.get_transport.return_value
             channel = transport.open_channel.return_value
+            channel.send.side_effect = len
+            if channel_exception:
+                transport.open_channel.side_effect = channel_exception
             # socket.socket is only called once directly
             mocket.return_value = listener_sock
             # The 2nd socket is obtained via an accept() (which should only
@@ -1092,8 +1638,11 @@ class Connection_:
                 [(tunnel_sock, local_addr)],
                 repeat(socket.error(errno.EAGAIN, "nothing yet")),
             )
-            obj = tunnel_sock if tunnel_exception is None else tunnel_exception
-            select.select.side_effect = _select_result(obj)
+            # The listener becomes readable first (yielding tunnel_sock), then
+            # tunnel_sock itself does, once its relay has been set up.
+            select.select.side_effect = _select_when_waited_on(
+                listener_sock, tunnel_sock
+            )
             with Connection("host").forward_local(**kwargs):
                 # Make sure we give listener thread enough time to boot up :(
                 # Otherwise we might assert before it does things. (NOTE:
@@ -1114,17 +1663,20 @@ class Connection_:
                         "direct-tcpip", (remote_host, remote_port), local_addr
                     )
                 # Local write to tunnel_sock is implied by its mocked-out
-                # recv() call above...
+                # recv_into() call above...
                 # NOTE: don't assert if explodey; we want to mimic "the only
                 # error that occurred was within the thread" behavior being
                 # tested by thread-exception-handling tests
-                if not (tunnel_exception or listener_exception):
-                    channel.sendall.assert_called_once_with(data)
+                if not (
+                    tunnel_exception or listener_exception or channel_exception
+                ):
+                    channel.send.assert_called_once_with(data)
             # Shutdown, with another sleep because threads.
             time.sleep(0.015)
             if not listener_exception:
                 tunnel_sock.close.assert_called_once_with()
-                channel.close.assert_called_once_with()
+                if not channel_exception:
+                    channel.close.assert_called_once_with()
                 listener_sock.close.assert_called_once_with()
 
         def forwards_local_port_to_remote_end(self):
@@ -1173,6 +1725,10 @@ class Connection_:
         def tunnel_manager_errors_bubble_up(self):
             self._thread_error("listener")
 
+        def channel_open_errors_bubble_up(self):
+            # (And the accepted socket still gets closed; see _forward_local)
+            self._thread_error("channel")
+
         # TODO: these require additional refactoring of _forward_local to be
         # more like the decorators in _util
         def multiple_tunnels_can_be_open_at_once(self):
@@ -1193,12 +1749,13 @@ class Connection_:
             # Mock/etc setup, anything that can be prepped before the forward
             # occurs (which is most things)
             tun_socket = mocket.return_value
+            tun_socket.send.side_effect = len
             cxn = Connection("host")
             # Channel that will yield data when read from
             chan = Mock()
-            chan.recv.return_value = "data"
-            # And make select() yield it as being ready once, when called
-            select.select.side_effect = _select_result(chan)
+            chan.recv.return_value = b"data"
+            # And make select() yield it as being ready once, when waited on
+            select.select.side_effect = _select_when_waited_on(chan)
             with cxn.forward_remote(**kwargs):
                 # At this point Connection.open() has run and generated a
                 # Transport mock for us (because SSHClient is mocked). Let's
@@ -1212,19 +1769,22 @@ class Connection_:
                 assert call[1]["port"] == remote_port
                 # Pretend the Transport called our callback with mock Channel
                 call[1]["handler"](chan, tuple(), tuple())
-                # Then have to sleep a bit to make sure we give the tunnel
-                # created by that callback to spin up; otherwise ~5% of the
-                # time we exit the contextmanager so fast, the tunnel's "you're
-                # done!" flag is set before it even gets a chance to select()
-                # once.
+                # Then have to sleep a bit to make sure we give the reactor
+                # a chance to pick up the relay created by that callback;
+                # otherwise we may exit the contextmanager so fast, it's told
+                # to stop before it even gets a chance to select() once.
                 time.sleep(0.01)
                 # And make sure we hooked up to the local socket OK
                 tup = (local_host, local_port)
                 tun_socket.connect.assert_called_once_with(tup)
-            # Expect that our socket got written to by the tunnel (due to the
+                # With Nagle's algorithm disabled, like OpenSSH does
+                tun_socket.setsockopt.assert_called_once_with(
+                    socket.IPPROTO_TCP, socket.TCP_NODELAY, 1
+                )
+            # Expect that our socket got written to by the reactor (due to the
             # above-setup select() and channel mocking). Need to do this after
-            # tunnel shutdown or we risk thread ordering issues.
-            tun_socket.sendall.assert_called_once_with("data")
+            # reactor shutdown or we risk thread ordering issues.
+            tun_socket.send.assert_called_once_with(b"data")
             # Ensure we closed down the mock socket
             mocket.return_value.close.assert_called_once_with()
             # And that the transport canceled the port forward on the remote
@@ -1247,13 +1807,119 @@ class Connection_:
                 {"remote_port": 1234, "remote_host": "192.168.1.254"}
             )
 
+        @patch("fabric.connection.socket.socket")
+        @patch("fabric.tunnels.select")
+        @patch("fabric.connection.SSHClient")
+        def _pooled_tunnels(self, pool, Client, select, mocket, peeks=None):
+            # Results of checking idle local sockets for unread data; beyond
+            # any given, there never is any.
+            idle = socket.error(
+                errno.EAGAIN, "Resource temporarily unavailable"
+            )
+            peeks = chain(peeks or [], repeat(idle))
+            mocket.return_value.recv.side_effect = peeks
+            # First channel hangs up right away; second one just sits there.
+            first, second = Mock(), Mock()
+            first.recv.return_value = b""
+            select.select.side_effect = _select_when_waited_on(first)
+            config = Config(overrides={"tunnels": {"pool": pool}})
+            cxn = Connection("host", config=config)
+            with cxn.forward_remote(remote_port=1234):
+                call = cxn.transport.request_port_forward.call_args
+                call[1]["handler"](first, tuple(), tuple())
+                time.sleep(0.01)
+                call[1]["handler"](second, tuple(), tuple())
+                time.sleep(0.01)
+                socket_count = mocket.call_count
+            return socket_count, mocket.return_value
+
+        def local_sockets_not_reused_by_default(self):
+            count, sock = self._pooled_tunnels(False)
+            assert count == 2
+            assert sock.close.call_count == 2
+
+        def local_sockets_reused_when_tunnels_pool_enabled(self):
+            count, sock = self._pooled_tunnels(True)
+            assert count == 1
+            # Closed only once, at shutdown, after sitting in the pool
+            sock.close.assert_called_once_with()
+
+        def _dirty_socket_replaced(self, peeks):
+            count, sock = self._pooled_tunnels(True, peeks=peeks)
+            assert count == 2
+            # Once when discarded, once at shutdown
+            assert sock.close.call_count == 2
+
+        def local_sockets_with_unread_data_not_pooled(self):
+            self._dirty_socket_replaced(peeks=[b"x"])
+
+        def local_sockets_at_eof_not_pooled(self):
+            self._dirty_socket_replaced(peeks=[b""])
+
+        def pooled_sockets_receiving_data_while_idle_not_reused(self):
+            idle = socket.error(
+                errno.EAGAIN, "Resource temporarily unavailable"
+            )
+            self._dirty_socket_replaced(peeks=[idle, b"late"])
+
+        @patch("fabric.connection.socket.socket")
+        @patch("fabric.tunnels.select")
+        @patch("fabric.connection.SSHClient")
+        def multiple_tunnels_can_be_open_at_once(self, Client, select, mocket):
+            first, second = Mock(), Mock()
+            first.recv.return_value = b"one"
+            second.recv.return_value = b"two"
+            mocket.return_value.send.side_effect = len
+            select.select.side_effect = _select_when_waited_on(first, second)
+            cxn = Connection("host")
+            with cxn.forward_remote(remote_port=1234):
+                call = cxn.transport.request_port_forward.call_args
+                call[1]["handler"](first, tuple(), tuple())
+                call[1]["handler"](second, tuple(), tuple())
+                time.sleep(0.01)
+            sent = mocket.return_value.send.call_args_list
+            assert sorted(x[0][0].tobytes() for x in sent) == [b"one", b"two"]
+            first.close.assert_called_once_with()
+            second.close.assert_called_once_with()
+
+        @patch("fabric.connection.socket.socket")
+        @patch("fabric.tunnels.select")
+        @patch("fabric.connection.SSHClient")
+        def tunnel_errors_bubble_up(self, Client, select, mocket):
+            chan = Mock()
+            chan.recv.side_effect = Exception("boom")
+            select.select.side_effect = _select_when_waited_on(chan)
+            cxn = Connection("host")
+            try:
+                with cxn.forward_remote(remote_port=1234):
+                    call = cxn.transport.request_port_forward.call_args
+                    call[1]["handler"](chan, tuple(), tuple())
+                    time.sleep(0.01)
+            except ThreadException as e:
+                assert len(e.exceptions) == 1
+                assert str(e.exceptions[0].value) == "boom"
+            else:
+                assert False, "Did not raise ThreadException as expected!"
+            # Port forward was still canceled
+            assert cxn.transport.cancel_port_forward.call_count == 1
+
+        @patch("fabric.connection.Reactor")
+        @patch("fabric.connection.SSHClient")
+        def teardown_cancels_while_reactor_shuts_down(self, Client, Reactor):
+            reactor = Reactor.return_value
+            reactor.exception.return_value = None
+            cxn = Connection("host")
+            calls = Mock()
+            with cxn.forward_remote(remote_port=1234):
+                calls.attach_mock(reactor.stop, "stop")
+                calls.attach_mock(reactor.join, "join")
+                cancel = cxn.transport.cancel_port_forward
+                calls.attach_mock(cancel, "cancel")
+            names = [x[0] for x in calls.mock_calls]
+            assert names[:3] == ["stop", "cancel", "join"]
+
         # TODO: these require additional refactoring of _forward_remote to be
         # more like the decorators in _util
-        def multiple_tunnels_can_be_open_at_once(self):
-            skip()
-
-        def tunnel_errors_bubble_up(self):
-            skip()
 
         def listener_errors_bubble_up(self):
             skip()
@@ -1,4 +1,9 @@
-from mock import Mock, patch, call
+try:
+    from invoke.vendor.six.moves.queue import Queue
+except ImportError:
+    from six.moves.queue import Queue
+
+from mock import MagicMock, Mock, patch
 from pytest_relaxed import raises
 
 from fabric import Connection, Group, SerialGroup, ThreadingGroup, GroupResult
@@ -27,6 +32,70 @@ class Group_:
             assert g[1].user == "admin"
             assert g[1].forward_agent is True
 
+        @patch("fabric.group.Connection")
+        def creates_Connections_lazily(self, Connection):
+            g = Group("foo", "bar", "biz", user="admin")
+            assert len(g) == 3
+            assert not Connection.called
+            assert g[1] is Connection.return_value
+            Connection.assert_called_once_with("bar", user="admin")
+            # Only once per member
+            g[1]
+            assert Connection.call_count == 1
+
+        @patch("fabric.group.Connection")
+        def iteration_creates_Connections_as_it_goes(self, Connection):
+            g = Group("foo", "bar", "biz")
+            for cxn in g:
+                break
+            Connection.assert_called_once_with("foo")
+
+    class lazy_members_never_leak:
+        def slicing(self):
+            g = Group("foo", "bar", "biz")
+            assert [x.host for x in g[1:]] == ["bar", "biz"]
+
+        def reversing(self):
+            g = Group("foo", "bar")
+            assert [x.host for x in reversed(g)] == ["bar", "foo"]
+
+        def membership_and_index(self):
+            g = Group("foo", "bar")
+            assert Connection("bar") in g
+            assert g.index(Connection("bar")) == 1
+
+        def pop(self):
+            g = Group("foo", "bar")
+            assert g.pop().host == "bar"
+            assert len(g) == 1
+
+        def equality_and_concatenation(self):
+            assert Group("foo") == Group("foo")
+            assert Group("foo") != Group("bar")
+            both = Group("foo") + Group("bar")
+            assert [x.host for x in both] == ["foo", "bar"]
+            assert all(isinstance(x, Connection) for x in list.__iter__(both))
+
+        def copying(self):
+            copied = Group("foo", "bar").copy()
+            assert [x.host for x in copied] == ["foo", "bar"]
+            assert all(isinstance(x, Connection) for x in copied)
+
+        def concatenation_onto_plain_lists(self):
+            cxn = Connection("foo")
+            both = [cxn] + Group("bar")
+            assert type(both) is list
+            assert both[0] is cxn
+            assert isinstance(both[1], Connection)
+            assert both[1].host == "bar"
+
+        def ordering(self):
+            assert Group("a", "b") < Group("a", "c")
+            assert Group("a") <= Group("a", "b")
+            assert Group("b") > Group("a", "c")
+            assert Group("a", "b") >= Group("a", "b")
+            assert not Group("a") > Group("a")
+
     class from_connections:
         def inits_from_iterable_of_Connections(self):
             g = Group.from_connections((Connection("foo"), Connection("bar")))
@@ -46,6 +115,98 @@ class Group_:
         def not_implemented_in_base_class(self):
             Group().run()
 
+    class forward_remote:
+        def _cxns(self):
+            cxns = [Mock(host=x) for x in ("host1", "host2")]
+            for cxn in cxns:
+                cxn._forward_remote.return_value = MagicMock()
+            return cxns
+
+        def _forwards_on_all_members(self, cls):
+            cxns = self._cxns()
+            g = cls.from_connections(cxns)
+            with g.forward_remote(1234, local_port=4321):
+                for cxn in cxns:
+                    args, kwargs = cxn._forward_remote.call_args
+                    assert kwargs == {"local_port": 4321}
+                    assert args[1] == 1234
+                    manager = cxn._forward_remote.return_value
+                    manager.__enter__.assert_called_once_with()
+                    assert not manager.__exit__.called
+            # All members share a single reactor
+            reactors = set(x._forward_remote.call_args[0][0] for x in cxns)
+            assert len(reactors) == 1
+            reactor = reactors.pop()
+            assert not reactor.is_alive()
+            for cxn in cxns:
+                manager = cxn._forward_remote.return_value
+                manager.__exit__.assert_called_once_with(None, None, None)
+
+        def serially(self):
+            self._forwards_on_all_members(SerialGroup)
+
+        def via_threading(self):
+            self._forwards_on_all_members(ThreadingGroup)
+
+        def setup_failures_tear_down_the_rest(self):
+            cxns = self._cxns()
+            oops = Exception("oops")
+            cxns[1]._forward_remote.return_value.__enter__.side_effect = oops
+            g = ThreadingGroup.from_connections(cxns)
+            try:
+                with g.forward_remote(1234):
+                    assert False, "Body should not have run!"
+            except GroupException as e:
+                assert e.result == {cxns[0]: None, cxns[1]: oops}
+            else:
+                assert False, "Did not raise GroupException!"
+            manager = cxns[0]._forward_remote.return_value
+            manager.__exit__.assert_called_once_with(None, None, None)
+            failed = cxns[1]._forward_remote.return_value
+            assert not failed.__exit__.called
+
+        def teardown_failures_raise_GroupException(self):
+            cxns = self._cxns()
+            oops = Exception("oops")
+            cxns[0]._forward_remote.return_value.__exit__.side_effect = oops
+            g = SerialGroup.from_connections(cxns)
+            try:
+                with g.forward_remote(1234):
+                    pass
+            except GroupException as e:
+                assert e.result == {cxns[0]: oops, cxns[1]: None}
+            else:
+                assert False, "Did not raise GroupException!"
+            # Other members still got torn down
+            manager = cxns[1]._forward_remote.return_value
+            manager.__exit__.assert_called_once_with(None, None, None)
+
+    class duplicate_members:
+        def _cxns(self):
+            # Two distinct, but equal, objects for the same target
+            cxns = [Connection(x) for x in ("foo", "bar", "foo")]
+            for cxn in cxns:
+                cxn.run = Mock()
+            return cxns
+
+        def are_skipped_by_default(self):
+            for cls in (SerialGroup, ThreadingGroup):
+                cxns = self._cxns()
+                result = cls.from_connections(cxns).run("whoami")
+                cxns[0].run.assert_called_once_with("whoami")
+                cxns[1].run.assert_called_once_with("whoami")
+                assert not cxns[2].run.called
+                assert result[cxns[2]] is cxns[0].run.return_value
+
+        def allow_duplicates_executes_on_them_anyway(self):
+            for cls in (SerialGroup, ThreadingGroup):
+                cxns = self._cxns()
+                g = cls.from_connections(cxns)
+                g.allow_duplicates = True
+                g.run("whoami")
+                for cxn in cxns:
+                    cxn.run.assert_called_once_with("whoami")
+
     class close_and_contextmanager_behavior:
         def close_closes_all_member_connections(self):
             cxns = [Mock(name=x) for x in ("foo", "bar", "biz")]
@@ -139,12 +300,8 @@ class ThreadingGroup_:
         self.kwargs = {"hide": True, "warn": True}
 
     class run:
-        @patch("fabric.group.Queue")
         @patch("fabric.group.ExceptionHandlingThread")
-        def executes_arguments_on_contents_run_via_threading(
-            self, Thread, Queue
-        ):
-            queue = Queue.return_value
+        def executes_arguments_on_contents_run_via_threading(self, Thread):
             g = ThreadingGroup.from_connections(self.cxns)
             # Make sure .exception() doesn't yield truthy Mocks. Otherwise we
             # end up with 'exceptions' that cause errors due to all being the
@@ -154,54 +311,76 @@ class ThreadingGroup_:
             # Testing that threads were used the way we expect is mediocre but
             # I honestly can't think of another good way to assert "threading
             # was used & concurrency occurred"...
-            instantiations = [
-                call(
-                    target=thread_worker,
-                    kwargs=dict(
-                        cxn=cxn,
-                        queue=queue,
-                        args=self.args,
-                        kwargs=self.kwargs,
-                    ),
-                )
-                for cxn in self.cxns
-            ]
-            Thread.assert_has_calls(instantiations, any_order=True)
+            assert Thread.call_count == len(self.cxns)
+            kwargs = Thread.call_args[1]
+            assert kwargs["target"] is thread_worker
+            assert kwargs["kwargs"]["args"] == self.args
+            assert kwargs["kwargs"]["kwargs"] == self.kwargs
             # These ought to work as by default a Mock.return_value is a
             # singleton mock object
             expected = len(self.cxns)
-            for name, got in (
-                ("start", Thread.return_value.start.call_count),
-                ("join", Thread.return_value.join.call_count),
-            ):
-                err = (
-                    "Expected {} calls to ExceptionHandlingThread.{}, got {}"
-                )  # noqa
-                err = err.format(expected, name, got)
-                assert expected, got == err
-
-        @patch("fabric.group.Queue")
-        def queue_used_to_return_results(self, Queue):
-            # Regular, explicit, mocks for Connections
+            assert Thread.return_value.start.call_count == expected
+            assert Thread.return_value.join.call_count == expected
+
+        @patch("fabric.group.ExceptionHandlingThread")
+        def workers_limits_thread_count(self, Thread):
+            Thread.return_value.exception.return_value = None
+            g = ThreadingGroup.from_connections(self.cxns)
+            g.workers = 2
+            g.run(*self.args, **self.kwargs)
+            assert Thread.call_count == 2
+
+        @patch("fabric.group.Connection")
+        @patch("fabric.group.ExceptionHandlingThread")
+        def workers_may_be_given_to_constructor(self, Thread, Connection):
+            Thread.return_value.exception.return_value = None
+            Connection.side_effect = lambda host, **kwargs: Mock(host=host)
+            g = ThreadingGroup("h1", "h2", "h3", workers=2, user="admin")
+            assert g.workers == 2
+            g.run(*self.args, **self.kwargs)
+            assert Thread.call_count == 2
+            # Not handed to the Connections, unlike other kwargs
+            Connection.assert_any_call("h1", user="admin")
+
+        @raises(ValueError)
+        def workers_below_one_rejected_by_constructor(self):
+            ThreadingGroup("h1", "h2", workers=0)
+
+        @raises(ValueError)
+        def negative_workers_rejected_by_constructor(self):
+            ThreadingGroup("h1", "h2", workers=-1)
+
+        @raises(ValueError)
+        def workers_attribute_below_one_rejected_at_run_time(self):
+            g = ThreadingGroup.from_connections(self.cxns)
+            g.workers = 0
+            g.run(*self.args, **self.kwargs)
+
+        @raises(TypeError)
+        def workers_not_a_run_option(self, client):
+            # Group-level only; per-command run() kwargs must not silently
+            # accept it.
+            Connection("host").run("true", group_workers=2)
+
+        def all_connections_run_with_fewer_workers_than_connections(self):
             cxns = [Mock(host=x) for x in ("host1", "host2", "host3")]
-            # Set up Queue with enough behavior to work / assert
-            queue = Queue.return_value
-            # Ending w/ a True will terminate a while-not-empty loop
-            queue.empty.side_effect = (False, False, False, True)
-            fakes = [(x, x.run.return_value) for x in cxns]
-            queue.get.side_effect = fakes[:]
-            # Execute & inspect results
             g = ThreadingGroup.from_connections(cxns)
+            g.workers = 1
             results = g.run(*self.args, **self.kwargs)
-            expected = {x: x.run.return_value for x in cxns}
-            assert results == expected
-            # Make sure queue was used as expected within worker &
-            # ThreadingGroup.run()
-            puts = [call(x) for x in fakes]
-            queue.put.assert_has_calls(puts, any_order=True)
-            assert queue.empty.called
-            gets = [call(block=False) for _ in cxns]
-            queue.get.assert_has_calls(gets)
+            assert results == {x: x.run.return_value for x in cxns}
+            for cxn in cxns:
+                cxn.run.assert_called_once_with(*self.args, **self.kwargs)
+
+        def thread_worker_drains_jobs_into_results_queue(self):
+            cxns = [Mock(host=x) for x in ("host1", "host2")]
+            jobs, queue = Queue(), Queue()
+            for cxn in cxns:
+                jobs.put(cxn)
+            thread_worker(jobs, queue, self.args, self.kwargs)
+            assert jobs.empty()
+            expected = [(x, x.run.return_value, False) for x in cxns]
+            assert [queue.get(block=False) for _ in cxns] == expected
+            assert queue.empty()
 
         def bubbles_up_errors_within_threads(self):
             # TODO: I feel like this is the first spot where a raw
@@ -245,3 +424,66 @@ class ThreadingGroup_:
             assert result == expected
             assert result.succeeded == expected
             assert result.failed == {}
+
+
+class GroupResult_:
+    def _result(self, exited=0):
+        return Mock(exited=exited, stdout="out{}".format(exited), stderr="")
+
+    def may_be_initialized_with_data(self):
+        result = GroupResult({"cxn": "value"})
+        assert result == {"cxn": "value"}
+        assert result.succeeded == {"cxn": "value"}
+
+    def columnar_attributes_follow_value_order(self):
+        one, two = self._result(0), self._result(1)
+        result = GroupResult()
+        result["host1"] = one
+        result["host2"] = two
+        assert result.exit_codes == [x.exited for x in result.values()]
+        assert result.stdouts == [x.stdout for x in result.values()]
+        assert result.stderrs == ["", ""]
+
+    def columnar_attributes_use_exception_results(self):
+        class OhNoz(Exception):
+            pass
+
+        unexpected = OhNoz()
+        unexpected.result = self._result(2)
+        result = GroupResult(host1=unexpected, host2=OhNoz())
+        codes = dict(zip(result.keys(), result.exit_codes))
+        assert codes == {"host1": 2, "host2": None}
+
+    def derived_attributes_are_cached(self):
+        value = self._result()
+        result = GroupResult(host1=value)
+        assert result.exit_codes == [0]
+        value.exited = 5  # Not noticed, as not a modification of result
+        assert result.exit_codes == [0]
+        assert result.succeeded is result.succeeded
+
+    def modifying_columns_does_not_affect_later_reads(self):
+        result = GroupResult(host1=self._result())
+        codes = result.exit_codes
+        codes.append(1)
+        codes[0] = 2
+        assert result.exit_codes == [0]
+
+    def modification_invalidates_derived_attributes(self):
+        result = GroupResult(host1=self._result())
+        assert result.exit_codes == [0]
+        assert len(result.succeeded) == 1
+        result["host2"] = self._result(3)
+        assert sorted(result.exit_codes) == [0, 3]
+        assert len(result.succeeded) == 2
+        del result["host1"]
+        assert result.exit_codes == [3]
+        result.update(host3=Exception())
+        assert len(result.failed) == 1
+        result.pop("host3")
+        assert result.failed == {}
+        assert result.exit_codes == [3]
+        result |= {"host4": self._result(4)}
+        assert sorted(result.exit_codes) == [3, 4]
+        result.clear()
+        assert result.exit_codes == []
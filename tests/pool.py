@@ -0,0 +1,97 @@
+from mock import Mock, patch
+
+from fabric.pool import SSHClientPool
+
+
+def _client(active=True):
+    client = Mock()
+    client.get_transport.return_value = Mock(active=active)
+    return client
+
+
+class SSHClientPool_:
+    def acquire_returns_None_when_empty(self):
+        assert SSHClientPool().acquire("key") is None
+
+    def released_clients_are_handed_back_out(self):
+        pool = SSHClientPool()
+        client = _client()
+        pool.release("key", client)
+        assert len(pool) == 1
+        assert pool.acquire("key") is client
+        assert len(pool) == 0
+        assert pool.acquire("key") is None
+
+    def clients_are_segregated_by_key(self):
+        pool = SSHClientPool()
+        client = _client()
+        pool.release("key", client)
+        assert pool.acquire("otherkey") is None
+        assert pool.acquire("key") is client
+
+    def inactive_clients_are_closed_on_release(self):
+        pool = SSHClientPool()
+        client = _client(active=False)
+        pool.release("key", client)
+        client.close.assert_called_once_with()
+        assert len(pool) == 0
+
+    def max_idle_evicts_longest_idle_clients_for_that_key(self):
+        pool = SSHClientPool()
+        old, new, other = _client(), _client(), _client()
+        pool.release("otherkey", other, max_idle=1)
+        pool.release("key", old, max_idle=1)
+        pool.release("key", new, max_idle=1)
+        old.close.assert_called_once_with()
+        assert not new.close.called
+        assert not other.close.called
+        assert pool.acquire("key") is new
+        assert pool.acquire("otherkey") is other
+
+    def max_idle_of_zero_disables_storage(self):
+        pool = SSHClientPool()
+        client = _client()
+        pool.release("key", client, max_idle=0)
+        client.close.assert_called_once_with()
+        assert len(pool) == 0
+
+    def clients_which_went_inactive_are_discarded_on_acquire(self):
+        pool = SSHClientPool()
+        client = _client()
+        pool.release("key", client)
+        client.get_transport.return_value.active = False
+        assert pool.acquire("key") is None
+        client.close.assert_called_once_with()
+
+    @patch("fabric.pool.time")
+    def idle_clients_are_discarded_on_acquire(self, time):
+        pool = SSHClientPool()
+        stale, fresh = _client(), _client()
+        time.time.return_value = 100
+        pool.release("key", stale)
+        pool.release("otherkey", fresh)
+        time.time.return_value = 200
+        assert pool.acquire("key", idle_timeout=60) is None
+        stale.close.assert_called_once_with()
+        # Expiry applies to every key, not just the one being acquired
+        assert len(pool) == 0
+        fresh.close.assert_called_once_with()
+
+    @patch("fabric.pool.time")
+    def idle_timeout_of_None_never_expires(self, time):
+        pool = SSHClientPool()
+        client = _client()
+        time.time.return_value = 100
+        pool.release("key", client)
+        time.time.return_value = 100000
+        assert pool.acquire("key", idle_timeout=None) is client
+
+    def clear_closes_everything(self):
+        pool = SSHClientPool()
+        one, two = _client(), _client()
+        pool.release("key", one)
+        pool.release("otherkey", two)
+        pool.clear()
+        assert len(pool) == 0
+        one.close.assert_called_once_with()
+        two.close.assert_called_once_with()
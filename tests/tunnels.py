@@ -0,0 +1,321 @@
+import errno
+import select
+import socket
+import time
+
+from threading import Event
+
+from invoke.exceptions import ThreadException
+from mock import Mock
+
+from fabric.tunnels import Reactor, Relay, Tunnel, TunnelManager, _Wakeup
+
+from _util import recv_into
+
+
+def _relay(sock_data=b"", chan_data=b"", buffers=None):
+    sock = Mock(name="sock", recv_into=Mock(side_effect=recv_into(sock_data)))
+    sock.send.side_effect = len
+    channel = Mock(name="channel", recv=Mock(return_value=chan_data))
+    channel.send.side_effect = len
+    relay = Relay(channel=channel, sock=sock, buffers=buffers)
+    return relay, channel, sock
+
+
+class Relay_:
+    def makes_socket_nonblocking(self):
+        relay, _, sock = _relay()
+        sock.setblocking.assert_called_once_with(0)
+
+    def forwards_socket_data_to_channel(self):
+        relay, channel, sock = _relay(sock_data=b"hi")
+        relay.service([sock], [])
+        channel.send.assert_called_once_with(b"hi")
+        assert not relay.closed
+
+    def forwards_channel_data_to_socket(self):
+        relay, channel, sock = _relay(chan_data=b"hi")
+        relay.service([channel], [])
+        sock.send.assert_called_once_with(b"hi")
+        assert relay.writers() == []
+
+    def holds_data_until_channel_is_send_ready(self):
+        relay, channel, sock = _relay(sock_data=b"hi")
+        channel.send_ready.return_value = False
+        relay.service([sock], [])
+        assert not channel.send.called
+        # Source isn't read again while its data is still pending
+        assert sock not in relay.readers()
+        channel.send_ready.return_value = True
+        relay.service([], [])
+        channel.send.assert_called_once_with(b"hi")
+        assert sock in relay.readers()
+
+    def partial_socket_writes_are_retried(self):
+        relay, channel, sock = _relay(chan_data=b"hello")
+        sock.send.side_effect = [
+            2,
+            socket.error(errno.EAGAIN, "full"),
+            3,
+        ]
+        relay.service([channel], [])
+        assert relay.writers() == [sock]
+        relay.service([], [sock])
+        assert relay.writers() == [sock]
+        relay.service([], [sock])
+        assert relay.writers() == []
+        assert sock.send.call_args_list[-1][0] == (b"llo",)
+
+    def reads_socket_data_into_its_buffer(self):
+        relay, channel, sock = _relay(sock_data=b"hi")
+        buf = relay._buffer
+        assert len(buf) == Relay.socket_chunk_size
+        relay.service([sock], [])
+        sock.recv_into.assert_called_once_with(buf)
+        # What's sent is a view of the buffer, not a copy
+        sent = channel.send.call_args[0][0]
+        assert isinstance(sent, memoryview)
+
+    def takes_buffer_from_freelist_and_returns_it_on_close(self):
+        buf = bytearray(Relay.socket_chunk_size)
+        buffers = [buf]
+        relay, _, _ = _relay(buffers=buffers)
+        assert relay._buffer is buf
+        assert buffers == []
+        relay.close()
+        assert buffers == [buf]
+        # And the next relay reuses it
+        other, _, _ = _relay(buffers=buffers)
+        assert other._buffer is buf
+
+    def allocates_buffer_when_freelist_empty(self):
+        buffers = []
+        relay, _, _ = _relay(buffers=buffers)
+        assert isinstance(relay._buffer, bytearray)
+        relay.close()
+        assert len(buffers) == 1
+
+    def hangup_closes_both_ends(self):
+        relay, channel, sock = _relay(chan_data=b"")
+        relay.service([channel], [])
+        assert relay.closed
+        channel.close.assert_called_once_with()
+        sock.close.assert_called_once_with()
+
+    def channel_hangup_hands_socket_to_release(self):
+        relay, channel, sock = _relay(chan_data=b"")
+        relay.release = Mock()
+        relay.service([channel], [])
+        channel.close.assert_called_once_with()
+        relay.release.assert_called_once_with(sock)
+        assert not sock.close.called
+
+    def socket_hangup_closes_both_ends(self):
+        relay, channel, sock = _relay(sock_data=b"")
+        relay.service([sock], [])
+        assert relay.closed
+        channel.close.assert_called_once_with()
+        sock.close.assert_called_once_with()
+
+    def close_is_idempotent(self):
+        relay, channel, sock = _relay()
+        relay.close()
+        relay.close()
+        channel.close.assert_called_once_with()
+        sock.close.assert_called_once_with()
+
+
+def _idle_relay():
+    return Mock(
+        closed=False,
+        readers=Mock(return_value=[]),
+        writers=Mock(return_value=[]),
+        polling=Mock(return_value=False),
+    )
+
+
+class Reactor_:
+    def stop_closes_relays_and_ends_thread(self):
+        reactor = Reactor()
+        reactor.start()
+        relay = _idle_relay()
+        reactor.add(relay)
+        reactor.stop()
+        reactor.join(5)
+        assert not reactor.is_alive()
+        relay.close.assert_called_once_with(reusable=True)
+        assert reactor.exception() is None
+
+    def relays_added_after_stop_are_closed(self):
+        reactor = Reactor()
+        reactor.start()
+        reactor.stop()
+        reactor.join(5)
+        relay = _idle_relay()
+        reactor.add(relay)
+        relay.close.assert_called_once_with(reusable=True)
+
+    def relay_errors_are_raised_as_ThreadException(self):
+        reactor = Reactor()
+        reactor.start()
+        relay = _idle_relay()
+        relay.service.side_effect = Exception("boom")
+        # Have the reactor service it even without any activity
+        relay.polling.return_value = True
+        reactor.add(relay)
+        for _ in range(500):
+            if relay.close.called:
+                break
+            time.sleep(0.01)
+        reactor.stop()
+        reactor.join(5)
+        wrapper = reactor.exception()
+        assert wrapper.type is ThreadException
+        assert str(wrapper.value.exceptions[0].value) == "boom"
+        assert relay.close.called
+
+
+class TunnelManager_:
+    def slow_channel_opens_do_not_hold_up_other_connections(self):
+        # Grab a free port for the manager to listen on.
+        probe = socket.socket()
+        probe.bind(("localhost", 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        near, far = socket.socketpair()
+        channel = Mock(
+            fileno=near.fileno,
+            recv=near.recv,
+            send=near.send,
+            send_ready=Mock(return_value=True),
+            close=near.close,
+        )
+        opened, slow_done = [], Event()
+
+        def open_channel(kind, dest_addr, src_addr):
+            opened.append(src_addr)
+            if len(opened) == 1:
+                slow_done.wait(5)
+                raise Exception("too slow")
+            return channel
+
+        transport = Mock(open_channel=Mock(side_effect=open_channel))
+        manager = TunnelManager(
+            local_host="localhost",
+            local_port=port,
+            remote_host="localhost",
+            remote_port=1234,
+            transport=transport,
+            finished=Event(),
+        )
+        manager.start()
+        try:
+            time.sleep(0.05)
+            slow = socket.create_connection(("localhost", port), 2)
+            for _ in range(200):
+                if opened:
+                    break
+                time.sleep(0.01)
+            fast = socket.create_connection(("localhost", port), 2)
+            fast.sendall(b"hi")
+            far.settimeout(2)
+            # Relayed while the first connection's channel is still opening
+            assert far.recv(2) == b"hi"
+            assert not slow_done.is_set()
+        finally:
+            slow_done.set()
+            manager.stop()
+            manager.join(5)
+        # The failed connection's socket got closed, and its error reported
+        slow.settimeout(2)
+        assert slow.recv(1) == b""
+        wrapper = manager.exception()
+        assert wrapper.type is ThreadException
+        assert str(wrapper.value.exceptions[0].value) == "too slow"
+        for sock in (slow, fast, far):
+            sock.close()
+
+
+class _Wakeup_:
+    def wakes_up_select(self):
+        wakeup = _Wakeup()
+        try:
+            wakeup.set()
+            r, _, _ = select.select(wakeup.readers(), [], [], 5)
+            assert r == [wakeup]
+            wakeup.clear()
+            r, _, _ = select.select(wakeup.readers(), [], [], 0)
+            assert r == []
+        finally:
+            wakeup.close()
+
+    def never_blocks_setters(self):
+        wakeup = _Wakeup()
+        try:
+            # Far more than a pipe's worth of pending wakeups
+            for _ in range(100000):
+                wakeup.set()
+        finally:
+            wakeup.close()
+
+    def set_after_close_is_harmless(self):
+        wakeup = _Wakeup()
+        wakeup.close()
+        wakeup.set()
+        assert wakeup.readers() == []
+
+
+class Tunnel_:
+    def holds_no_wakeup_pipe_unless_running(self):
+        tunnel = Tunnel(channel=Mock(), sock=Mock(), finished=Event())
+        assert tunnel._wakeup is None
+        # Stopping a never-started tunnel is fine
+        tunnel.stop()
+        assert tunnel.finished.is_set()
+
+    def closes_wakeup_pipe_even_if_cleanup_fails(self):
+        channel = Mock()
+        channel.close.side_effect = Exception("boom")
+        tunnel = Tunnel(channel=channel, sock=Mock(), finished=Event())
+        tunnel.finished.set()
+        tunnel.run()
+        assert tunnel.exception() is not None
+        assert tunnel._wakeup._fds is None
+
+
+class stop_wakes_threads_immediately:
+    # NOTE: well under the one second it takes to notice a bare finished.set()
+
+    def TunnelManager(self):
+        manager = TunnelManager(
+            local_host="localhost",
+            local_port=0,
+            remote_host="localhost",
+            remote_port=1234,
+            transport=Mock(),
+            finished=Event(),
+        )
+        manager.start()
+        time.sleep(0.05)
+        start = time.time()
+        manager.stop()
+        manager.join(5)
+        assert not manager.is_alive()
+        assert time.time() - start < 0.5
+        assert manager.exception() is None
+
+    def Tunnel(self):
+        channel, near = socket.socketpair()
+        sock, far = socket.socketpair()
+        try:
+            tunnel = Tunnel(channel=channel, sock=sock, finished=Event())
+            tunnel.start()
+            time.sleep(0.05)
+            start = time.time()
+            tunnel.stop()
+            tunnel.join(5)
+            assert not tunnel.is_alive()
+            assert time.time() - start < 0.5
+        finally:
+            for x in (channel, near, sock, far):
+                x.close()